@@ -6,12 +6,14 @@
 # file for GVP.
 #
 # 1) retrieve_vinfo: loads data for one volcano from 2 dataframes
-# 2) rocks_to_color: computes color based on rock composition
-# 3) extracts_by_filter: finds volcanoes as per filter input
-# 4) extract_by_event: finds volcanoes with given events
+# 2) rocks_to_color: computes color based on rock composition (rocks_to_colors for all volcanoes at once)
+# 3) extracts_by_filter: finds volcanoes as per filter input (using filter_volcanoes)
+# 4) extract_by_event: finds volcanoes with given events (using create_event_counts)
 # 5) update_chronogram
-# 6) fix_dates_VEI
-# 7) fix_events
+# 6) create_eruption_dates: fixes missing dates and VEI of all eruptions, once (used by fix_dates_VEI)
+# 7) create_eruption_events: summarizes the events of all eruptions, once (used by fix_events)
+# 8) create_eruption_sequences: computes repose times and durations of all eruptions, once (used by repose_stats)
+# 9) update_repose_chart: draws repose times and durations of the eruptions of one volcano
 #
 # Author: F. Oggier
 # Last update: Sep 3 2022
@@ -27,7 +29,7 @@ def retrieve_vinfo(name, df1, df2, whichrocks):
     Args:
         name: name (string) of the volcano whose data is to be retrieved from df1, df2
         df1: dataframe volcanoes (dfv)
-        df2: dataframe eruptions (df)
+        df2: dataframe eruptions (df), the eruptions of the volcano are read from the eruption store
         whichrocks:
 
     Returns: a list containing the volcano name, its VEIs, its rocks, the eruption times
@@ -35,8 +37,10 @@ def retrieve_vinfo(name, df1, df2, whichrocks):
     """
     # volcano name
     datv = [name]
+    # eruptions of this volcano, with the same values as in df2
+    dferup = volcano_eruptions(name, typed=False)
     # extracts vei
-    lstvei = list(df2[df2['Volcano Name'] == name]['VEI'].values)
+    lstvei = list(dferup['VEI'].values)
     datv.append(lstvei)
     # extracts rocks
     rocks_orig = list(df1[df1[list(df1)[1]] == name][whichrocks].values[0])
@@ -49,12 +53,12 @@ def retrieve_vinfo(name, df1, df2, whichrocks):
     datv.append(ridx)
     # volume info not available for gvp?
     # retrieves dates
-    days1 = list(df2[df2['Volcano Name'] == name]['Start Day'].values)
-    days2 = list(df2[df2['Volcano Name'] == name]['End Day'].values)
-    months1 = list(df2[df2['Volcano Name'] == name]['Start Month'].values)
-    months2 = list(df2[df2['Volcano Name'] == name]['End Month'].values)
-    year1 = list(df2[df2['Volcano Name'] == name]['Start Year'].values)
-    year2 = list(df2[df2['Volcano Name'] == name]['End Year'].values)
+    days1 = list(dferup['Start Day'].values)
+    days2 = list(dferup['End Day'].values)
+    months1 = list(dferup['Start Month'].values)
+    months2 = list(dferup['End Month'].values)
+    year1 = list(dferup['Start Year'].values)
+    year2 = list(dferup['End Year'].values)
     datv.append([days1, days2, months1, months2, year1, year2])
 
     return datv
@@ -66,37 +70,66 @@ def rocks_to_color(rid):
     Args:
         rid: the rock composition
 
-    Returns: a corresponding color code
+    Returns: a corresponding color code (see rocks_to_colors)
+
+    """
+    cc_r, cc_g, cc_b = rocks_to_colors(np.array([rid]))[0]
+
+    return int(cc_r), int(cc_g), int(cc_b)
+
+
+def rocks_to_colors(ridx):
+    """
+
+    Args:
+        ridx: array of rock compositions, one row per volcano, one column per rock of rock_sorted
+              (position of the rock in the list of rocks of the volcano, starting from 1, 0 if not present)
+
+    Returns: an array with one color code (red, green, blue) per volcano
 
     """
     # coloring based on rock composition
-    if rid[9] > 0 and rid[6] == 0:
-        cc_r = max(200 - (rid[9] - 1) * 16, 115)
-        cc_g = 0
-    elif rid[9] == 0 and rid[6] > 0:
-        cc_r = max(255 - (rid[6] - 1) * 26, 115)
-        cc_g = 64
-    elif rid[9] > 0 and rid[6] > 0:
-        cc_r = max(200 - (rid[9] - 1) * 16, 115)
-        cc_g = 64
-    else:
-        cc_r = 0
-        cc_g = 0
+    # felsic rocks give red, 64 is added to green if rid[6] > 0
+    red = np.where(ridx[:, 9] > 0, np.maximum(200 - (ridx[:, 9] - 1) * 16, 115),
+                   np.where(ridx[:, 6] > 0, np.maximum(255 - (ridx[:, 6] - 1) * 26, 115), 0))
+    green = np.where(ridx[:, 6] > 0, 64, 0)
     # intermediate and mafic
-    if rid[2] > 0 and rid[3] == 0:
-        cc_b = max(255 - (rid[2] - 1) * 26, 115)
-        cc_g += 0
-    elif rid[2] == 0 and rid[3] > 0:
-        cc_g += max(255 - 64 - (rid[3] - 1) * 26, 115)
-        cc_b = 0
-    elif rid[2] > 0 and rid[3] > 0:
-        cc_g += max(255 - 64 - (rid[3] - 1) * 26, 115)
-        cc_b = max(255 - (rid[2] - 1) * 26, 115)
+    green = green + np.where(ridx[:, 3] > 0, np.maximum(255 - 64 - (ridx[:, 3] - 1) * 26, 115), 0)
+    blue = np.where(ridx[:, 2] > 0, np.maximum(255 - (ridx[:, 2] - 1) * 26, 115), 0)
+
+    return np.stack([red, green, blue], axis=-1)
+
+
+# color of every volcano of dfv (in the same order) based on its rock composition
+volcano_rock_colors = ['rgb(%d, %d, %d)' % tuple(c)
+                       for c in rocks_to_colors(dfv[['Weighted ' + r for r in rock_col]].values)]
+
+
+def filter_volcanoes(filters, witheruptions=True):
+    """
+
+    Args:
+        filters: a dictionary mapping attributes of volcano_index ('Country', 'Tectonic Settings',
+                 'Primary Volcano Type', 'Major Rock', 'max VEI') to lists of values
+        witheruptions: True to only keep volcanoes with eruptions (dfv), False to also keep those of dfvne
+
+    Returns: list of volcanoes having one of the given values, for every attribute
+
+    """
+    if witheruptions:
+        mask = volcano_index['eruptions'].copy()
     else:
-        cc_b = 0
-        cc_g += 0
+        mask = np.ones(len(volcano_index['eruptions']), dtype=bool)
+
+    for attr, values in filters.items():
+        # values of one attribute are combined with or, attributes with and
+        attrmask = np.zeros(len(mask), dtype=bool)
+        for v in values:
+            if v in volcano_index[attr].keys():
+                attrmask |= volcano_index[attr][v]
+        mask &= attrmask
 
-    return cc_r, cc_g, cc_b
+    return list(pd.unique(volcano_index['Volcano Name'][mask]))
 
 
 def extract_by_filter(countryname, tectonicsetting):
@@ -109,19 +142,40 @@ def extract_by_filter(countryname, tectonicsetting):
     Returns: list of volcanoes filtered by choice of input
 
     """
-    if countryname == 'all':
-        dftmp = dfv
-    else:
-        dftmp = dfv[dfv['Country'] == countryname]
+    filters = {}
+    if not (countryname == 'all'):
+        filters['Country'] = [countryname]
 
     lst_tect = [tt.strip() for tt in tectonicsetting if not (tt == 'start') and not (tt is None)]
     if len(lst_tect) > 0:
-        dftmp = dftmp[dftmp['Tectonic Settings'].isin(lst_tect)]
-    lst_byfilter = list(set(dftmp['Volcano Name'].unique()))
+        filters['Tectonic Settings'] = lst_tect
+    lst_byfilter = filter_volcanoes(filters)
 
     return lst_byfilter
 
 
+def create_event_counts(key):
+    """
+
+    Args:
+        key: 'Volcano Name' or 'Eruption Number'
+
+    Returns:
+        a dataframe counting the events of dfev, with one row per value of key
+        and one column per event type
+
+    """
+    counts = pd.crosstab(dfev[key], dfev['Event Type'])
+    counts.columns.name = None
+
+    return counts
+
+
+# number of events of each type, per volcano and per eruption
+volcano_event_counts = create_event_counts('Volcano Name')
+eruption_event_counts = create_event_counts('Eruption Number')
+
+
 def extract_by_event(lstvolc, lstev):
     """
 
@@ -132,28 +186,13 @@ def extract_by_event(lstvolc, lstev):
     Returns: events associated to volcanoes
 
     """
-    events_cols = []
     dfevent = pd.DataFrame()
     # narrows down events to volcanoes in lstvolc (possibly empty)
-    dftmp = dfev[dfev['Volcano Name'].isin(lstvolc)]
-
-    if len(dftmp.index) > 0:
-        # shortlists based on input
-        event_type = lstev
-        for nm in lstvolc:
-            # extracts events per volcano
-            events_pervolc = list(dftmp[dftmp['Volcano Name'] == nm]['Event Type'].values)
-            # for every volcano, keeps a list that counts each event
-            eidx = [0] * len(event_type)
-            for ev in events_pervolc:
-                if ev in event_type:
-                    eidx[event_type.index(ev)] = len([x for x in events_pervolc if x == ev])
-            events_cols.append(eidx)
+    if volcano_event_counts.index.isin(lstvolc).any():
+        # for every volcano, counts each event of the list, 0 if the volcano or the event is not present
+        dfevent = volcano_event_counts.reindex(index=lstvolc, columns=lstev, fill_value=0).reset_index(drop=True)
         # attach event types to volcanoes
-        dfevent['Volcano Name'] = pd.Series(np.array(lstvolc)).values
-        for event in event_type:
-            newcol = [x[event_type.index(event)] for x in events_cols]
-            dfevent[event] = pd.Series(np.array(newcol)).values
+        dfevent.insert(0, 'Volcano Name', lstvolc)
 
     return dfevent
     
@@ -181,7 +220,7 @@ def update_chronogram(thesevolcanoes, period):
         dict_names_rev[thesevolcanoes.index(nm)] = nm
 
     # extracts data for set of volcanoes
-    thisdf = df[df['Volcano Name'].isin(thesevolcanoes)]
+    thisdf = volcano_eruptions(thesevolcanoes, typed=False)
 
     # start dates
     # removes if no start year
@@ -225,8 +264,8 @@ def update_chronogram(thesevolcanoes, period):
                     x=thisdfv['Start Date'],
                     mode='markers+lines',
                     marker_symbol=thisdfv['symbol'],
-                    y=(i - .4) + thisdfv['VEI'].astype(float) / 9,
-                    text=thisdfv['VEI'],
+                    y=(i - .4) + thisdfv['VEI'] / 9,
+                    text=thisdfv['VEI'].astype(int),
                     hovertemplate='VEI: %{text} <br> %{x}',
                     name='VEI',
                     showlegend=False
@@ -282,8 +321,8 @@ def update_chronogram(thesevolcanoes, period):
                     x=thisdfv['Start Year'],
                     mode='markers+lines',
                     marker_symbol=thisdfv['symbol'],
-                    y=(i - .4) + thisdfv['VEI'].astype(float) / 9,
-                    text=thisdfv['VEI'],
+                    y=(i - .4) + thisdfv['VEI'] / 9,
+                    text=thisdfv['VEI'].astype(int),
                     hovertemplate='VEI: %{text} <br> %{x}',
                     name='VEI',
                     showlegend=False
@@ -306,192 +345,257 @@ def update_chronogram(thesevolcanoes, period):
     return thisfig
 
 
-def fix_dates_VEI(df_missing, thisdict_names, bns):
+def create_eruption_dates():
     """
-    adjust the missing dates in dataframe as well as the missing VEI
-    bns = before nanoseconds (before 1678)
+
+    Returns:
+        a dataframe with one row per confirmed eruption (same index as df), where missing dates and VEI are fixed:
+            * 'VEI': missing VEI are replaced by the VEI of the eruption before in time of the same volcano
+              (next in df), or by 2 if there is none, 'symbol' is star if the VEI was missing, circle otherwise,
+            * 'Start Year', 'End Year': the recorded years, a missing end year is replaced by the start year,
+            * 'BC': 0 for negative start years, 1 otherwise,
+            * 'Start Date', 'End Date': dates where missing months and days are imputed,
+              NaT before 1678 (nanosecond timestamps) or if the date is not valid,
+            * 'Recorded start', 'Recorded end': the dates as recorded in GVP,
+            * 'Start (years)', 'End (years)': the imputed dates as (fractional) years, also before 1678.
+
     """
+    erup = eruption_store
+    sy = erup['Start Year'].astype(float).values
+    ey = erup['End Year'].astype(float).values
+    # 0 is used when the month or the day is not known
+    sm, em, sd, ed = [erup[col].astype(float).replace(0, np.nan).values
+                      for col in ['Start Month', 'End Month', 'Start Day', 'End Day']]
+
+    # MISSING START
+    # missing start month, available end month and end year
+    cond = np.isnan(sm) & ~np.isnan(em) & ~np.isnan(ey)
+    # if start year not equal to end year, then use start month = end month,
+    # if start year = end year, then use end month minus 3 months if end month greater than 3, 1 otherwise
+    sm = np.where(cond, np.where(sy != ey, em, np.where(em > 3, em - 3, 1)), sm)
+
+    # MISSING END
+    # start has only year and end month is missing, use 6 (June)
+    # this puts this category into start has year and month
+    sm = np.where(np.isnan(sm) & np.isnan(em), 6, sm)
+    # start month is known, end completely missing
+    # no end year, use start if month is less than 10, start + 1 otherwise
+    cond = ~np.isnan(sm) & np.isnan(em) & np.isnan(ey)
+    ey = np.where(cond, np.where(sm < 10, sy, sy + 1), ey)
+    # start month is known, only end year is known
+    # if start year not equal to end year, then use end month = start month,
+    # if start year = end year, then use start month plus 3 months if start month less than 10, 12 otherwise
+    cond = ~np.isnan(sm) & np.isnan(em) & ~np.isnan(ey)
+    em = np.where(cond, np.where(sy != ey, sm, np.where(sm < 10, sm + 3, 12)), em)
+
+    # at this point, all years and months are complete
+    # if no start day, use 1, if no end day, use 28
+    sd = np.where(np.isnan(sd), 1, sd)
+    ed = np.where(np.isnan(ed), 28, ed)
+
+    # dates in years, e.g. 1902.5 for the 1st of July 1902, also before 1678
+    start_years = sy + (sm - 1) / 12 + (sd - 1) / 365.25
+    end_years = ey + (em - 1) / 12 + (ed - 1) / 365.25
+
+    # plotly doesn't seem to plot if end and start are the same, so shifts the end/start by 2 days
+    sameday = (sy == ey) & (sm == em) & (sd == ed)
+    ed = np.where(sameday & (ed < 27), ed + 2, ed)
+    sd = np.where(sameday & (ed >= 27), sd - 2, sd)
 
-    # first create a symbol (star) if VEI is missing, and another (circle) if VEI is here
-    symb = df_missing.apply(
-        lambda row: 'star' if pd.isnull(row['VEI']) else 'circle', axis=1)
-    # replace every unvalid VEI with the one before in time (next in df)
-    # use next valid observation to fill gap
-    df_missing['VEI'].fillna(method='bfill', inplace=True)
-    # when there is nothing after (in df), just use 2
-    df_missing['VEI'].fillna('2', inplace=True)
-    
     # stores the dates before adjusting them
-    true_start = df_missing['Start Year'].astype(str) + '-' + df_missing['Start Month'].astype(str) \
-                                                      + '-' + df_missing['Start Day'].astype(str)
-    true_end = df_missing['End Year'].astype(str) + '-' + df_missing['End Month'].astype(str) + '-' \
-                                                  + df_missing['End Day'].astype(str)
+    true_start = df_byvolcano['Start Year'].astype(str) + '-' + df_byvolcano['Start Month'].astype(str) \
+        + '-' + df_byvolcano['Start Day'].astype(str)
+    true_end = df_byvolcano['End Year'].astype(str) + '-' + df_byvolcano['End Month'].astype(str) \
+        + '-' + df_byvolcano['End Day'].astype(str)
+
+    erup_dates = pd.DataFrame({
+        'Eruption Number': erup['Eruption Number'],
+        'Volcano Name': erup['Volcano Name'],
+        # replace every unvalid VEI with the one before in time (next in df), 2 if there is nothing after
+        'VEI': erup['VEI'].groupby(erup['Volcano Number']).bfill().fillna(2),
+        'symbol': np.where(erup['VEI'].isna(), 'star', 'circle'),
+        'Start Year': erup['Start Year'],
+        'End Year': erup['End Year'].fillna(erup['Start Year']),
+        # could be negative years (BC)
+        'BC': np.where(erup['Start Year'].fillna(0) < 0, 0, 1),
+        'Start Date': pd.to_datetime(pd.DataFrame({'year': sy, 'month': sm, 'day': sd}), errors='coerce').values,
+        'End Date': pd.to_datetime(pd.DataFrame({'year': ey, 'month': em, 'day': ed}), errors='coerce').values,
+        'Recorded start': true_start,
+        'Recorded end': true_end,
+        'Start (years)': start_years,
+        'End (years)': end_years,
+    }, index=erup.index)
+
+    return erup_dates
+
+
+# eruption dates and VEI of all confirmed eruptions, with missing data fixed
+eruption_dates = create_eruption_dates()
+
+
+def create_eruption_sequences():
+    """
+
+    Returns:
+        a dataframe with one row per confirmed eruption with a start year, sorted by volcano, then start date:
+            * 'Volcano Number', 'Volcano Name', 'Eruption Number', 'VEI' (as recorded, NaN if unknown),
+            * 'Start (years)', 'End (years)': imputed dates (see create_eruption_dates),
+            * 'Duration (years)': time from start to end, NaN if the end is before the start,
+            * 'Repose (years)': time from the end of the eruptions before (of the same volcano) to the start,
+              0 if they overlap, NaN for the first eruption,
+            * 'Rank': 1 for the first eruption of the volcano, 2 for the second, etc.
+        and a dictionary giving, for every volcano name, the range of its rows.
+
+    """
+    erup = eruption_dates[eruption_dates['Start (years)'].notna()]
+    vno = eruption_store.loc[erup.index, 'Volcano Number'].values
+    start = erup['Start (years)'].values
+    end = erup['End (years)'].values
+    # missing ends are dated as the start
+    end = np.where(np.isnan(end), start, end)
+
+    order = np.lexsort((start, vno))
+    vno, start, end = vno[order], start[order], end[order]
+    # first row of every volcano
+    first = np.r_[True, vno[1:] != vno[:-1]]
+    bounds = np.flatnonzero(first)
+    rank = np.arange(len(vno)) - np.repeat(bounds, np.diff(np.r_[bounds, len(vno)]))
+
+    # end of the eruptions before, they may overlap, so the latest end is taken
+    latest = pd.Series(end).groupby(vno).cummax().values
+    previous = np.r_[np.nan, latest[:-1]]
+    repose = np.where(first, np.nan, np.maximum(start - previous, 0))
+    duration = np.where(end >= start, end - start, np.nan)
+
+    thisseq = pd.DataFrame({'Volcano Number': vno,
+                            'Volcano Name': erup['Volcano Name'].values[order],
+                            'Eruption Number': erup['Eruption Number'].values[order].astype(int),
+                            'VEI': eruption_store.loc[erup.index, 'VEI'].values[order],
+                            'Start (years)': start,
+                            'End (years)': end,
+                            'Duration (years)': duration,
+                            'Repose (years)': repose,
+                            'Rank': rank + 1})
+
+    thisrows = dict(zip(thisseq['Volcano Name'].values[bounds], zip(bounds, np.r_[bounds[1:], len(vno)])))
+
+    return thisseq, thisrows
+
+
+def repose_stats(thisseq, by=None):
+    """
+
+    Args:
+        thisseq: eruption sequences, as computed by create_eruption_sequences (possibly a subset)
+        by: columns by which eruptions are grouped, together with their VEI class ('Volcano Name' if None)
+
+    Returns:
+        a dataframe with, for every group and VEI class ('VEI class', 'unknown' if the VEI is not known),
+        the number of eruptions, and the median, mean, minimum, maximum of 'Repose (years)' and 'Duration (years)'.
+
+    """
+    if by is None:
+        by = ['Volcano Name']
+    vclass = thisseq['VEI'].astype('Int64').astype(str).replace('<NA>', 'unknown').rename('VEI class')
+    grouped = thisseq.groupby([thisseq[col] for col in by] + [vclass])
+    thisstats = grouped[['Repose (years)', 'Duration (years)']].agg(['median', 'mean', 'min', 'max'])
+    thisstats.columns = [stat + ' ' + col.split(' ')[0].lower() + ' (years)' for col, stat in thisstats.columns]
+    thisstats.insert(0, 'Eruptions', grouped.size())
+
+    return thisstats.reset_index()
+
+
+# eruptions of all volcanoes in time order, with their repose and duration
+eruption_sequences, eruption_sequence_rows = create_eruption_sequences()
+# repose and duration statistics of all volcanoes per VEI class
+eruption_sequence_stats = repose_stats(eruption_sequences)
+
+
+def update_repose_chart(thisvolcano):
+    """
+
+    Args:
+        thisvolcano: GVP name of a volcano
+
+    Returns:
+        a figure showing, for every eruption of this volcano, its repose time (time since the eruptions before)
+        and its duration, in years, against its start, colored by VEI, with the median repose and duration per VEI
+        class in the legend. The scale is logarithmic, so eruptions starting before the end of the eruptions before
+        (repose time 0) are not shown.
+
+    """
+    lo, hi = eruption_sequence_rows.get(thisvolcano, (0, 0))
+    thisseq = eruption_sequences.iloc[lo:hi]
+    thisstats = eruption_sequence_stats[eruption_sequence_stats['Volcano Name'] == thisvolcano]
+
+    thisfig = go.Figure()
+    for vc, medrepose, medduration in thisstats[['VEI class', 'median repose (years)',
+                                                 'median duration (years)']].values:
+        # same colors as the chronogram
+        if vc == 'unknown':
+            dff = thisseq[thisseq['VEI'].isna()]
+            vcol = 'gray'
+        else:
+            dff = thisseq[thisseq['VEI'] == int(vc)]
+            vcol = px.colors.sequential.Reds[int(vc)]
+        # durations are hidden at first, they can be shown from the legend
+        for col, med, symbol, visible in [('Repose', medrepose, 'circle', True),
+                                          ('Duration', medduration, 'square', 'legendonly')]:
+            thisfig.add_trace(
+                go.Scatter(
+                    x=dff['Start (years)'],
+                    y=dff[col + ' (years)'],
+                    mode='markers',
+                    marker=dict(color=vcol, symbol=symbol, line=dict(width=1, color='black')),
+                    customdata=dff['Eruption Number'],
+                    hovertemplate='eruption %{customdata}<br>start=%{x:.1f}<br>' + col.lower() + '=%{y:.2f} years',
+                    name=col + ', VEI ' + vc + ' (median: ' + str(round(med, 1)) + ')',
+                    visible=visible,
+                )
+            )
+
+    thisfig.update_layout(title='<b>Repose times and durations of eruptions</b> <br>',
+                          xaxis_title='start (years)', yaxis_title='years', yaxis_type='log',
+                          plot_bgcolor='white', legend=dict(font=dict(size=10)))
+    thisfig.update_xaxes(showline=True, linewidth=1, linecolor='black')
+    thisfig.update_yaxes(showline=True, linewidth=1, linecolor='black')
+
+    return thisfig
 
+
+def fix_dates_VEI(df_missing, thisdict_names, bns):
+    """
+    retrieves the eruptions of df_missing (a subset of df) from eruption_dates,
+    where missing dates and VEI are fixed, volcano names are replaced using thisdict_names
+    bns = before nanoseconds (before 1678)
+    """
     if bns:
         # before nanosecond, just uses year
         # data with no start year should have been removed before this function
-        # if end year is missing, uses the same year
-        df_missing['End Year'] = df_missing.apply(
-            lambda row: row['Start Year'] if pd.isnull(row['End Year']) else row['End Year'], axis=1)
-        # could be negative years (BC)
-        bc = df_missing.apply(lambda row: 0 if int(row['Start Year']) < 0 else 1, axis=1)
-
-        # creates new dataframe
         headers = ['Eruption Number', "Volcano Name", "VEI", "Start Year", "End Year", 'symbol', 'BC',
                    'Recorded start', 'Recorded end']
-        df3 = pd.concat([df_missing['Eruption Number'], df_missing['Volcano Name'].replace(thisdict_names),
-                         df_missing['VEI'], df_missing['Start Year'].astype(int),
-                         df_missing['End Year'].astype(int), symb, bc, true_start, true_end], axis=1, keys=headers)
     else:
-        # MISSING START 
-        # missing start month, available end month and end year
-        cond_start = (df_missing['Start Month'] == '0') | pd.isnull(df_missing['Start Month'])
-        cond_end = ~(df_missing['End Month'] == '0') & ~pd.isnull(df_missing['End Month']) \
-                                                     & ~pd.isnull(df_missing['End Year'])
-
-        # if start year not equal to end year, then use start month = end month
-        df_missing.loc[:, 'Start Month'] = (
-            np.where(
-                (cond_start & cond_end & ~(df_missing['Start Year'] == df_missing['End Year'])),
-                df_missing['End Month'], df_missing['Start Month'])
-        )
-        
-        # refreshes missing data
-        # then years are the same
-        cond_start = (df_missing['Start Month'] == '0') | pd.isnull(df_missing['Start Month'])
-        cond_end = ~(df_missing['End Month'] == '0') & ~pd.isnull(df_missing['End Month']) \
-                                                     & ~pd.isnull(df_missing['End Year'])
-        # if start year = end year, and if end month greater than 3, then use end month minus 3 months
-        df_missing.loc[:, 'Start Month'] = (
-            np.where(
-                (cond_start & cond_end & (df_missing['End Month'].astype('float') > 3)),
-                df_missing['End Month'].astype('float') - 3, df_missing['Start Month'])
-        )
-        # refreshes missing data
-        # then end month is <= 3
-        cond_start = (df_missing['Start Month'] == '0') | pd.isnull(df_missing['Start Month'])
-        cond_end = ~(df_missing['End Month'] == '0') & ~pd.isnull(df_missing['End Month']) \
-                                                     & ~pd.isnull(df_missing['End Year'])
-        # if start year = end year, and if end month less than 3 
-        df_missing.loc[:, 'Start Month'] = (
-            np.where(
-                (cond_start & cond_end),
-                '1', df_missing['Start Month'])
-        )
-        
-        # MISSING END 
-        # start has only year
-        cond_start = (df_missing['Start Month'] == '0') | pd.isnull(df_missing['Start Month'])
-        # end monthy is missing, end year could be here or not
-        cond_end = ((df_missing['End Month'] == '0') | pd.isnull(df_missing['End Month']))
-
-        # no start month, use 6 (June)
-        # this puts this category into start has year and month
-        df_missing.loc[:, 'Start Month'] = (
-            np.where(
-                (cond_start & cond_end),
-                '6', df_missing['Start Month'])
-        )
-
-        # start month is known
-        cond_start = ~(df_missing['Start Month'] == '0') & ~pd.isnull(df_missing['Start Month'])
-        # end completely missing
-        cond_end = ((df_missing['End Month'] == '0') | pd.isnull(df_missing['End Month'])) & pd.isnull(df_missing['End Year'])
-
-        # add end year
-        # this puts this category into start has year and month, end has only year
-        # no end year, use either start if month is less than 10
-        df_missing['End Year'] = (
-            np.where(
-                (cond_start & cond_end & (df_missing['Start Month'].astype('float') < 10)),
-                df_missing['Start Year'], df_missing['End Year'])
-        )
-        # no end year, use start + 1 if month is more than 10
-        df_missing['End Year'] = (
-            np.where(
-                (cond_start & cond_end & (df_missing['Start Month'].astype('float') >= 10)),
-                df_missing['Start Year'].astype('float')+1, df_missing['End Year'])
-        )
-        
-        # start month is known
-        cond_start = ~(df_missing['Start Month'] == '0') & ~pd.isnull(df_missing['Start Month'])
-        # only end year is known
-        cond_end = ((df_missing['End Month'] == '0') | pd.isnull(df_missing['End Month'])) & ~pd.isnull(df_missing['End Year'])
-
-        # if start year not equal to end year, then use start month = end month
-        df_missing.loc[:, 'End Month'] = (
-            np.where(
-                (cond_start & cond_end & ~(df_missing['Start Year'] == df_missing['End Year'])),
-                df_missing['Start Month'], df_missing['End Month'])
-        )
-        # refreshes missing data
-        # then years are the same
-        cond_start = ~(df_missing['Start Month'] == '0') & ~pd.isnull(df_missing['Start Month'])
-        cond_end = ((df_missing['End Month'] == '0') | pd.isnull(df_missing['End Month'])) & ~pd.isnull(df_missing['End Year'])
-        # if start year = end year, and if start month less than 10, then use start month plus 3 months
-        df_missing.loc[:, 'End Month'] = (
-            np.where(
-                (cond_start & cond_end & (df_missing['Start Month'].astype('float') < 10)),
-                df_missing['Start Month'].astype('float') + 3, df_missing['End Month'])
-        )
-        # refreshes missing data
-        # then start month is > 10
-        cond_start = ~(df_missing['Start Month'] == '0') & ~pd.isnull(df_missing['Start Month'])
-        cond_end = ((df_missing['End Month'] == '0') | pd.isnull(df_missing['End Month'])) & ~pd.isnull(df_missing['End Year'])
-        # if start year = end year, and if end month less than 3
-        df_missing.loc[:, 'End Month'] = (
-            np.where(
-                (cond_start & cond_end),
-                '12', df_missing['End Month'])
-        )
-        # at this point, all years and months are complete
-        cond_start = (df_missing['Start Day'] == '0') | pd.isnull(df_missing['Start Day'])
-
-        # if no start day, use 1
-        df_missing.loc[:, 'Start Day'] = (
-            np.where(
-                cond_start,
-                '1', df_missing['Start Day'])
-        )
-        
-        cond_end = (df_missing['End Day'] == '0') | pd.isnull(df_missing['End Day'])
-        # if no end day, use 28
-        df_missing.loc[:, 'End Day'] = (
-            np.where(
-                cond_end,
-                '28', df_missing['End Day'])
-        )
-        
-        # plotly doesn't seem to plot if end and start are the same, so shifts the end/start by 2 days
-        sameday = (df_missing['Start Year'] == df_missing['End Year']) & \
-                  (df_missing['Start Month'] == df_missing['End Month']) & \
-                  (df_missing['Start Day'] == df_missing['End Day'])
-        df_missing['End Day'] = np.where((sameday & (df_missing['End Day'].astype('float') < 27)),
-                                         df_missing['End Day'].astype('int')+2, df_missing['End Day'])
-        df_missing['Start Day'] = np.where((sameday & (df_missing['End Day'].astype('float') >= 27)),
-                                           df_missing['Start Day'].astype('int')-2, df_missing['Start Day'])
-        
-        # compiles whole date
-        start = df_missing['Start Year'].astype('int').astype(str) + '-' + \
-                df_missing['Start Month'].astype('int').astype(str) + '-' + \
-                df_missing['Start Day'].astype('int').astype(str)
-          
-        # compile whole date
-        end = df_missing['End Year'].astype('int').astype(str) + '-' + \
-              df_missing['End Month'].astype('int').astype(str) + '-' + \
-              df_missing['End Day'].astype('int').astype(str)
-
-        # creates new dataframe
         headers = ['Eruption Number', "Volcano Name", "VEI", "Start Date", "End Date", 'symbol',
                    'Recorded start', 'Recorded end']
-        df3 = pd.concat(
-            [df_missing['Eruption Number'], df_missing['Volcano Name'].replace(thisdict_names), df_missing['VEI'],
-             start, end, symb, true_start, true_end], axis=1, keys=headers)
-        
+
+    df3 = eruption_dates.loc[df_missing.index, headers]
+    df3['Volcano Name'] = df3['Volcano Name'].replace(thisdict_names)
+    if bns:
+        df3[['Start Year', 'End Year']] = df3[['Start Year', 'End Year']].astype(int)
+
     return df3
 
-def fix_events(df_be, bns):
-    """ bns = before nanoseconds (before 1678)
+
+def create_eruption_events():
+    """
+
+    Returns:
+        a dataframe with one row per confirmed eruption, that summarizes its eruptive events (in the order of dfev):
+            * 'Event List': the list of events, 3 per line,
+            * 'Count': the number of events,
+            * 'Color': the color bucket (for discrete_map) of the number of events,
+            * 'Color bns': the corresponding color, for before nanoseconds (before 1678).
+
     """
     eruption_events = ['Phreatic activity', 'Lava lake', 'Lava fountains',
                        'Cinder cone formation', 'Fissure formation', 'Lava flow(s)',
@@ -500,49 +604,40 @@ def fix_events(df_be, bns):
                        'Partial collapse at end of eruption', 'Avalanche', 'Tsunami',
                        'Directed explosion', 'Crater formation', 'Caldera formation']
 
-    erupnos = list(df_be['Eruption Number'].unique())
-    thisdfev = dfev[dfev['Eruption Number'].isin(erupnos)]
-    thisdfev = thisdfev[thisdfev['Event Type'].isin(eruption_events)]
-    ev_count = []
-    for en in erupnos:
-        theseevs = list(thisdfev[thisdfev['Eruption Number'] == en]['Event Type'].values)
-        ev_str = ''
-        # list of events per eruption
-        three_events = 0
-        for ev in theseevs:
-            three_events += 1
-            if (three_events % 3) == 0:
-                ev_str += ev + ',<br>'
-            else:
-                ev_str += ev + ', '
-        if ev_str.endswith(','):
-            ev_str = ev_str[:-1]
-        # choose color
-        if not bns:
-            # data for discrete_map
-            if len(theseevs) <= 2:
-                col = '1'
-            elif len(theseevs) > 2 and len(theseevs) <= 6:
-                col = '2'
-            elif len(theseevs) > 6 and len(theseevs) <= 12:
-                col = '4'
-            elif len(theseevs) > 12 and len(theseevs) <= 17:
-                col = '6'
-            else:
-                col = '8'
-        else:
-            # color directly in this column
-            if len(theseevs) <= 2:
-                col = px.colors.sequential.Reds[1]
-            elif len(theseevs) > 2 and len(theseevs) <= 6:
-                col = px.colors.sequential.Reds[2]
-            elif len(theseevs) > 6 and len(theseevs) <= 12:
-                px.colors.sequential.Reds[4]
-            elif len(theseevs) > 12 and len(theseevs) <= 17:
-                px.colors.sequential.Reds[6]
-            else:
-                px.colors.sequential.Reds[8]
-        ev_count.append([en, ev_str, len(theseevs), col])
+    thisdfev = dfev[dfev['Event Type'].isin(eruption_events)]
+    erupnos = thisdfev['Eruption Number'].astype(int)
+    # list of events per eruption, a line break after every third event
+    third = (thisdfev.groupby(erupnos).cumcount() + 1) % 3 == 0
+    ev_str = (thisdfev['Event Type'] + np.where(third, ',<br>', ', ')).groupby(erupnos).agg(''.join)
+
+    df4 = pd.DataFrame({'Eruption Number': pd.unique(np.array(lst_eruptions, dtype=int))})
+    df4['Event List'] = df4['Eruption Number'].map(ev_str).fillna('')
+    df4['Count'] = eruption_event_counts.reindex(index=df4['Eruption Number'], columns=eruption_events,
+                                                 fill_value=0).sum(axis=1).values
+    # buckets: at most 2, 6, 12, 17 events, more than 17
+    bucket = np.searchsorted([2, 6, 12, 17], df4['Count'].values)
+    # data for discrete_map
+    df4['Color'] = np.array(['1', '2', '4', '6', '8'])[bucket]
+    # color directly in this column
+    df4['Color bns'] = np.array([px.colors.sequential.Reds[int(c)] for c in ['1', '2', '4', '6', '8']])[bucket]
+
+    return df4.set_index('Eruption Number', drop=False)
+
+
+# summary of the eruptive events of all confirmed eruptions
+eruption_event_summary = create_eruption_events()
+
+
+def fix_events(df_be, bns):
+    """ 
+    retrieves the events of the eruptions in df_be from eruption_event_summary
+    bns = before nanoseconds (before 1678)
+    """
+    erupnos = df_be['Eruption Number'].astype(int).unique()
+    df4 = eruption_event_summary.loc[erupnos]
+    if bns:
+        df4 = df4.drop(columns=['Color']).rename(columns={'Color bns': 'Color'})
+    else:
+        df4 = df4.drop(columns=['Color bns'])
 
-    df4 = pd.DataFrame(ev_count, columns=['Eruption Number', 'Event List', 'Count', 'Color'])
-    return df4
+    return df4.reset_index(drop=True)
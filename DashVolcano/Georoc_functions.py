@@ -14,11 +14,36 @@
 # 6) extract_date: extract date information, if any, from the field LOCATION COMMENTS.
 # 7) plot_tas: draws the TAS background.
 # 8) detects_chems: finds abnormal chemicals.
-# 9) plot_chem: plots the samples on a TAS diagram.
+# 9) plot_chem: plots the samples on a TAS diagram, at most a budget of them (decimate_samples),
+#    with WebGL for many samples (scatter_type).
 # 10) match_gvpdates: given a Georoc date, matches GVP date based on year.
 # 11) update_chemchart: updates the plots based on dates.
-# 12) update_onedropdown: creates menus for filtering data per date.
+# 12) update_onedropdown: creates menus for filtering data per date (using date_options).
 # 13) create_georoc_around_gvp: creates a dataframe of GEOROC samples around GVP volcanoes
+# 14) boxes_around_points: finds which sample boxes contain at least one volcano, using a latitude index
+# 15) create_georoc_locations: creates a dataframe of all GEOROC locations
+# 16) samples_within_radius: finds GEOROC locations within a radius (km) of a point
+# 17) samples_near_gvp: finds GEOROC locations within a radius (km) of every GVP volcano
+# 18) match_eruptions: matches GEOROC dates to GVP eruptions, using interval indexes (interval_index, interval_lookup)
+# 19) create_georoc_gvp_eruptions: creates the table linking every GEOROC sample to its GVP eruption
+# 20) link_eruptions: attaches GVP eruptions to GEOROC samples of one volcano
+# 21) date_options: computes the eruption dates of one volcano for the date menus
+# 22) create_georoc_dates: creates the table of eruption dates of every GEOROC volcano
+# 23) load_samples: keeps the samples of a volcano in memory, sorted by date keys (prepare_samples, date_key, date_slice)
+# 24) oxide_stats, chem_thresholds: computes statistics of oxides, and the values above which chemicals are abnormal
+# 25) robust_scores: computes median/MAD outlier scores of oxides per group of samples (e.g. material, see material_type)
+# 26) create_georoc_samples: creates the table of samples of every GEOROC volcano (read by load_georoc_samples)
+# 27) create_georoc_outliers: creates the table of outlier scores of every GEOROC sample
+# 28) create_georoc_majorrocks: creates the table of rock types of every GEOROC volcano and material (majorrocks_wide)
+# 29) bin_chems: computes the median and quartiles of chemicals per bin of years
+# 30) rock_consistency: compares GVP rocks with the rocks of GEOROC samples, for every mapped volcano
+# 31) harker_bins: computes the bins of samples in Harker diagrams (counted by harker_density)
+# 32) tas_density: computes the TAS density of all GEOROC samples per filter (tas_bins, sample_arcs, plot_tas_density)
+# 33) create_georoc_arcs: creates the arc store, one file of samples per arc (load_georoc_arcs, load_arc_samples)
+# 34) update_arc_chemchart: draws the TAS diagram of whole arcs or tectonic settings
+# 35) classify_file: classifies the samples of a CSV or Excel file, chunk by chunk (read_chunks, classify_chunk)
+# 36) register_upload: keeps an uploaded file and its status on disk under a random token
+#                      (upload_paths, upload_status, update_upload_status, remove_upload)
 #
 # Author: F. Oggier
 # Last update: Jan 25 2023
@@ -28,6 +53,12 @@ from DashVolcano.config_variables import *
 import plotly.graph_objs as go
 from numpy.linalg import inv
 import re
+import itertools
+import openpyxl
+import secrets
+import tempfile
+import time
+import json
 
 file_directory = os.path.dirname(os.path.realpath(__file__))
 top_directory = os.path.abspath(os.path.join(file_directory, os.pardir))
@@ -557,7 +588,7 @@ def plot_tas(thisfig):
     return thisfig
 
 
-def detects_chems(thisdf, chem1, chem2, theselbls):
+def detects_chems(thisdf, chem1, chem2, theselbls, thresholds=None):
     """
 
     Args:
@@ -566,6 +597,8 @@ def detects_chems(thisdf, chem1, chem2, theselbls):
                first is SIO2, second is NA20, 3rd id K20
         chem2: list (synthax) for more chemical
         theselbls: a set of labels for GEOROC, one for PetDB
+        thresholds: dictionary giving, for every chemical of chem2, the value above which it is abnormal,
+                    computed from thisdf if not given (see chem_thresholds)
 
     Returns:
         an updated dataframe containing the data for a TAS plot
@@ -579,23 +612,62 @@ def detects_chems(thisdf, chem1, chem2, theselbls):
     # removes if 80 >= SIO2 is > 0
     thisdf = thisdf[(thisdf[chem1[0]] <= 80) & (thisdf[chem1[0]] > 0) & (thisdf['FEOT(WT%)'] > 0)]
     thisdf[chem1[1]+'+'+chem1[2]] = thisdf[chem1[1]].astype('float') + thisdf[chem1[2]].astype('float')
-    
+
+    if thresholds is None:
+        # only mean and std are needed
+        thresholds = chem_thresholds(thisdf[chem2].astype('float').agg(['mean', 'std']).T, chem2)
+
+    # one bit per chemical of chem2, set if the chemical is abnormal
+    bits = 2 ** np.arange(len(chem2))
+    excess = (thisdf[chem2].astype('float').values > np.array([thresholds[mc] for mc in chem2])) * bits
+    for i, mc in enumerate(chem2):
+        thisdf['excess' + mc] = excess[:, i]
+
+    # the sum of the bits gives the label
+    thisdf['color'] = pd.Categorical.from_codes(excess.sum(axis=1), categories=theselbls)
+
+    return thisdf
+
+
+def oxide_stats(thisdf, theseoxides):
+    """
+
+    Args:
+        thisdf: a dataframe of chemicals, with missing values replaced by 0
+        theseoxides: list of oxides (columns of thisdf)
+
+    Returns:
+        a dataframe with one row per oxide, and its count, mean, std, min, quartiles and max as columns
+
+    """
+    return thisdf[theseoxides].astype('float').describe().T
+
+
+def chem_thresholds(thisstats, chem2):
+    """
+
+    Args:
+        thisstats: statistics of chemicals, as computed by oxide_stats
+        chem2: list (synthax) for more chemical
+
+    Returns:
+        a dictionary giving, for every chemical of chem2, the value above which it is abnormal,
+        that is mean + standard deviation (mean only if there is a single sample)
+
+    """
+    thresholds = {}
     for mc in chem2:
-        st_mc = thisdf[mc].astype('float').std()
-        mn_mc = thisdf[mc].astype('float').mean()
+        st_mc = thisstats.loc[mc, 'std']
+        mn_mc = thisstats.loc[mc, 'mean']
         if not (np.isnan(st_mc)):
-            mstd = mn_mc + st_mc
+            thresholds[mc] = mn_mc + st_mc
         else:
-            mstd = mn_mc
-        thisdf['excess' + mc] = 0
-        thisdf.loc[thisdf[mc].astype('float') > mstd, 'excess' + mc] = 2 ** (chem2.index(mc))
-
-    thisdf['color'] = [theselbls[x] for x in list(thisdf.loc[:, ['excess' + mc for mc in chem2]].sum(axis=1).values)]
+            thresholds[mc] = mn_mc
 
-    return thisdf
+    return thresholds
 
 
-def plot_chem(thisfig, thisdf, chem1, theselbls):
+def plot_chem(thisfig, thisdf, chem1, theselbls, budget=taspointbudget):
     """
 
     Args:
@@ -604,9 +676,11 @@ def plot_chem(thisfig, thisdf, chem1, theselbls):
         chem1: list (synthax) for usual chemicals
                first is SIO2, second is NA20, 3rd id K20
         theselbls: a set of labels for GEOROC, one for PetDB
+        budget: maximum number of samples drawn (see decimate_samples), all if None
 
     Returns:
-        Plots a scatter plot of the chemical composition
+        Plots a scatter plot of the chemical composition,
+        indicating how many samples are shown when some are decimated
 
     """
     # if theselbls == lbls2:
@@ -639,9 +713,13 @@ def plot_chem(thisfig, thisdf, chem1, theselbls):
         full_symbol = {'circle': 'whole rock', 'diamond': 'volcanic glass', 'square': 'inclusion',
                        'x': 'mineral', 'diamond-wide': 'UNKNKOWN'}
         short_symbol = ['circle', 'diamond', 'square', 'x', 'diamond-wide'] 
-    
+
+    # draws at most budget samples
+    shown = thisdf.iloc[decimate_samples(thisdf, chem1, budget)]
+    Scatter = scatter_type(len(shown.index))
+
     for symbol in short_symbol:
-        thismat = thisdf[thisdf['symbol'] == symbol]
+        thismat = shown[shown['symbol'] == symbol]
         
         # custom data
         if 'VEI' in list(thisdf):
@@ -651,7 +729,7 @@ def plot_chem(thisfig, thisdf, chem1, theselbls):
         
         # plots
         thisfig.add_trace(
-            go.Scatter(
+            Scatter(
                 x=thismat[chem1[0]],
                 y=thismat[chem1[1]+'+'+chem1[2]],
                 customdata=thiscustomdata,
@@ -665,10 +743,11 @@ def plot_chem(thisfig, thisdf, chem1, theselbls):
         )
         
     # styles the markers
+    # (only the samples, the figure may contain a density, see plot_tas_density)
     thisfig.update_traces(marker=dict(size=12,
                                       line=dict(width=2,
-                                                color='DarkSlateGrey'))
-                          # selector=dict(mode='markers')
+                                                color='DarkSlateGrey')),
+                          selector=dict(mode='markers')
                           )
     if theselbls == lbls2:
         title = 'Chemical Rock Composition from PetDB'
@@ -682,17 +761,103 @@ def plot_chem(thisfig, thisdf, chem1, theselbls):
         width=1.5*600,
         height=600,
     )
+    if len(shown.index) < len(thisdf.index):
+        thisfig.add_annotation(
+            text=str(len(shown.index)) + ' of ' + str(len(thisdf.index)) + ' samples shown',
+            xref='paper', yref='paper', x=1, y=1.05,
+            showarrow=False,
+        )
 
     return thisfig
-    
-    
-def match_gvpdates(volcano_name, date, gvpvname):
+
+
+def scatter_type(npoints):
+    """
+
+    Args:
+        npoints: number of points of a scatter plot
+
+    Returns:
+        go.Scattergl (drawn with WebGL) if there are more than webglthreshold points, go.Scatter (SVG) otherwise,
+        both take the same arguments
+
+    """
+    if npoints > webglthreshold:
+        return go.Scattergl
+
+    return go.Scatter
+
+
+def decimate_samples(thisdf, chem1, budget):
+    """
+
+    Args:
+        thisdf: dataframe of samples to be drawn in a TAS diagram, with their 'symbol' (see plot_chem)
+        chem1: list (synthax) for usual chemicals
+               first is SIO2, second is NA20, 3rd id K20
+        budget: maximum number of samples, all if None
+
+    Returns:
+        the positions in thisdf of at most budget samples, in increasing order.
+        Outliers (robust z-score above outlierthreshold, see robust_scores) are kept first, up to half the budget.
+        The rest of the budget is shared between rocks (see guess_rock) and symbols (materials or VEI)
+        in proportion of their number of samples, with at least one sample each if the budget allows it,
+        and the samples of each of them are evenly spaced.
+
+    """
+    n = len(thisdf.index)
+    if budget is None or n <= budget:
+        return np.arange(n)
+
+    # outliers, the largest scores first
+    if 'OUTLIER SCORE' in list(thisdf):
+        scores = thisdf['OUTLIER SCORE'].astype(float).values
+    else:
+        scores = robust_scores(thisdf, scoredoxides, [material_type(thisdf)])['OUTLIER SCORE'].values
+    outliers = np.where(scores > outlierthreshold)[0]
+    outliers = outliers[np.argsort(-scores[outliers], kind='stable')][:budget // 2]
+    keep = np.zeros(n, dtype=bool)
+    keep[outliers] = True
+
+    # strata of the other samples
+    if 'ROCK' in list(thisdf):
+        rocks = thisdf['ROCK'].astype(str).values
+    else:
+        rocks = guess_rock(thisdf[chem1].astype(float))['ROCK'].values
+    strata, _ = pd.factorize(pd.Series(rocks) + ' ' + thisdf['symbol'].astype(str).values)
+    rest = np.where(~keep)[0]
+    order = rest[np.argsort(strata[rest], kind='stable')]
+    sizes = np.bincount(strata[rest], minlength=strata.max() + 1)
+    remaining = budget - len(outliers)
+    # one sample per stratum if possible, then shares of what remains
+    if np.count_nonzero(sizes) <= remaining:
+        minimum = (sizes > 0).astype(int)
+    else:
+        minimum = np.zeros(len(sizes), dtype=int)
+    shares = minimum + (remaining - minimum.sum()) * sizes / len(rest)
+    quotas = np.minimum(sizes, np.floor(shares).astype(int))
+    # the samples left go to the strata with the largest rounded down shares (or cut off by their size)
+    while quotas.sum() < remaining and (quotas < sizes).any():
+        spare = [i for i in np.argsort(quotas - shares, kind='stable') if quotas[i] < sizes[i]]
+        quotas[spare[:remaining - quotas.sum()]] += 1
+
+    start = 0
+    for size, quota in zip(sizes, quotas):
+        if quota > 0:
+            keep[order[start + np.linspace(0, size - 1, quota).round().astype(int)]] = True
+        start += size
+
+    return np.where(keep)[0]
+
+
+def match_gvpdates(volcano_name, date, gvpvname, georoc_years=None):
     """
 
     Args:
         volcano_name: GEOROC name
         date: GEOROC date, it can also take the value "forall", in which case it maps all GEOROC dates to GVP dates
         gvpvname: GVP volcano name
+        georoc_years: GEOROC eruption years, only used for "forall", loaded from volcano_name if not given
     Returns:
         matching GVP dates, it is a pair for a single GEOROC date, and a list of pairs for all GEOROC dates,
         the matching is done based on years
@@ -700,82 +865,185 @@ def match_gvpdates(volcano_name, date, gvpvname):
     """
     
     date_gvp = []   
-    
-    # retrieves dates from georoc
-    dfgeoroc = load_georoc(volcano_name)
-    dvv = dfgeoroc[dfgeoroc['LOCATION-4'] == ' ' + volcano_name]
-    dmy = dvv[['ERUPTION DAY', 'ERUPTION MONTH', 'ERUPTION YEAR']]
-    dmy = dmy.dropna(how='all')
-    
-    if len(dmy.index) > 0:
-        # dates from GVP
-        gvpdate = df[df['Volcano Name'] == gvpvname].drop(['Start Year', 'End Year'], axis=1)
-        gvpdate['Start Year'] = pd.to_numeric(df['Start Year'])
-        gvpdate['End Year'] = pd.to_numeric(df['End Year'])
-        # if NaN for 'End Year', uses 'Start Year'
-        gvpdate['End Year'] = gvpdate.apply(
-            lambda row: row['Start Year'] if pd.isnull(row['End Year']) else row['End Year'], axis=1)
-
-        if not(date == 'forall'):
-            # retrieves the georoc date when only one date is of interest
-            if '-' in date:
-                s = date.split('-')
-                gy = int(s[0])
-            else:
-                gy = int(date)
-            gy_list = [gy]
-        else:
-            # this is to retrieve all dates
-            gy_list = dmy['ERUPTION YEAR'].unique()
-            
-        all_dates_gvp = []
-         
-        for gy in gy_list:
-            # matches the dates from both databases
-            fnd = gvpdate[(gvpdate['Start Year'] <= gy) & (gvpdate['End Year'] == gy)]
-            if len(fnd.index) > 0:
-                # gvp
-                if not(date == 'forall'):
-                    date_gvp = [str(int(fnd['Start Year'])), str(int(fnd['End Year']))]
-                else:
-                    date_gvp = fnd[['Start Year', 'End Year']].astype(int).astype(str).values
+
+    if not(date == 'forall'):
+        # retrieves the georoc date when only one date is of interest
+        gy_list = [int(date.split('-')[0])]
+    else:
+        # this is to retrieve all dates
+        if georoc_years is None:
+            dfgeoroc = load_georoc(volcano_name)
+            georoc_years = dfgeoroc[dfgeoroc['LOCATION-4'] == ' ' + volcano_name]['ERUPTION YEAR']
+        gy_list = pd.Series(georoc_years).dropna().unique()
+
+    all_dates_gvp = []
+
+    if len(gy_list) > 0:
+        # matches the dates from both databases
+        fnd = match_eruptions(gvpvname, gy_list)
+        for gy, sy, ey in zip(gy_list, fnd['Start Year'], fnd['End Year']):
+            if np.isnan(sy):
+                date_gvp = ['not found']
             else:
-                fndbefore = gvpdate[(gvpdate['Start Year'].astype(int) <= gy) & (gvpdate['End Year'].astype(int) > gy)]
-                if len(fndbefore.index) > 0:
-                    # this if condition is in case not confirmed eruptions are considered
-                    # in the new Excel, only confirmed eruptions are here
-                    if fndbefore.iloc[0]['Eruption Category'] == 'Confirmed Eruption':
-                        rwidx = 0
-                    elif fndbefore.iloc[1]['Eruption Category'] == 'Confirmed Eruption':
-                        rwidx = 1
-                    else:
-                        rwidx = 2
-                    if not(date == 'forall'):    
-                        date_gvp = [str(int(fndbefore.iloc[rwidx]['Start Year'])),
-                                    str(int(fndbefore.iloc[rwidx]['End Year']))]         
-                    else:
-                        date_gvp = [[str(int(fndbefore.iloc[rwidx]['Start Year'])),
-                                    str(int(fndbefore.iloc[rwidx]['End Year']))]] 
-                else:
-                    date_gvp = ['not found']              
+                date_gvp = [str(int(sy)), str(int(ey))]
+                if date == 'forall':
+                    all_dates_gvp.append([gy, date_gvp])
             
-            for dg in date_gvp:
-                if type(dg) != str: 
-                    all_dates_gvp.append([gy, dg])
-                         
         if date == 'forall':
             date_gvp = all_dates_gvp
                             
     return date_gvp
 
+
+# GVP eruptions of every volcano, indexed by dates, filled at the first match
+gvp_eruption_intervals = {}
+
+
+def load_eruption_intervals(gvpvname):
+    """
+
+    Args:
+        gvpvname: GVP volcano name
+
+    Returns:
+        the confirmed eruptions of this volcano (in the order of df, most recent first) as arrays,
+        with 3 interval indexes:
+            * 'ends': eruptions ending in a given year,
+            * 'spans': eruptions started on or before, and ending after, a given year,
+            * 'months': eruptions starting and ending in the same year, with both months known, indexed by month.
+
+    """
+    if not (gvpvname in gvp_eruption_intervals.keys()):
+        dferup = volcano_eruptions(gvpvname)
+        start = dferup['Start Year'].astype(float).values
+        end = dferup['End Year'].astype(float).values
+        # if NaN for 'End Year', uses 'Start Year'
+        end = np.where(np.isnan(end), start, end)
+        # 0 is used when the month is not known
+        start_month = dferup['Start Month'].fillna(0).astype(float).values
+        end_month = dferup['End Month'].fillna(0).astype(float).values
+        same_year = (start == end) & (start_month > 0) & (end_month > 0)
+
+        gvp_eruption_intervals[gvpvname] = {
+            'Eruption Number': dferup['Eruption Number'].values.astype(float),
+            'Start Year': start,
+            'End Year': end,
+            # an eruption ending in year gy is only kept if it started on or before gy
+            'ends': interval_index(np.where(start <= end, end, np.nan), end, True),
+            'spans': interval_index(start, end, False),
+            'months': interval_index(np.where(same_year, start * 12 + start_month, np.nan),
+                                     np.where(same_year, end * 12 + end_month, np.nan), True),
+        }
+
+    return gvp_eruption_intervals[gvpvname]
+
+
+def interval_index(lo, hi, closed):
+    """
+
+    Args:
+        lo: array of interval starts, NaN for intervals to be ignored
+        hi: array of interval ends
+        closed: True if intervals are [lo, hi], False if they are [lo, hi)
+
+    Returns:
+        an index of the intervals: the sorted breakpoints (all interval ends), and for every breakpoint,
+        and every gap between consecutive breakpoints, the first interval (in the given order) containing it,
+        or -1. The set of intervals containing a value is the same all over a gap, so a lookup is a searchsorted.
+
+    """
+    bp = np.unique(np.concatenate([lo, hi])[~np.isnan(np.concatenate([lo, hi]))])
+    if len(bp) == 0:
+        return {'bp': bp, 'pt': np.array([], dtype=int), 'gap': np.array([-1])}
+
+    pts = bp[:, None]
+    # a gap contains no breakpoint, its middle stands for the whole gap
+    mids = ((bp[:-1] + bp[1:]) / 2)[:, None]
+
+    if closed:
+        at_pt = (lo <= pts) & (hi >= pts)
+    else:
+        at_pt = (lo <= pts) & (hi > pts)
+    in_gap = (lo <= mids) & (hi >= mids)
+
+    return {'bp': bp,
+            'pt': np.where(at_pt.any(axis=1), at_pt.argmax(axis=1), -1),
+            # nothing after the last breakpoint
+            'gap': np.append(np.where(in_gap.any(axis=1), in_gap.argmax(axis=1), -1), -1)}
+
+
+def interval_lookup(thisindex, x):
+    """
+
+    Args:
+        thisindex: an index computed by interval_index
+        x: array of values
+
+    Returns:
+        for every value, the position of the first interval containing it, or -1
+
+    """
+    x = np.asarray(x, dtype=float)
+    bp = thisindex['bp']
+    if len(bp) == 0:
+        return np.full(len(x), -1)
+
+    p = np.searchsorted(bp, x, side='right') - 1
+    pc = np.clip(p, 0, len(bp) - 1)
+    exact = bp[pc] == x
+    fnd = np.where(exact, thisindex['pt'][pc], thisindex['gap'][pc])
+
+    # before the first breakpoint
+    return np.where(p < 0, -1, fnd)
+
+
+def match_eruptions(gvpvname, years, months=None):
+    """
+
+    Args:
+        gvpvname: GVP volcano name
+        years: array of GEOROC eruption years
+        months: array of GEOROC eruption months (0 or NaN if not known), optional
+
+    Returns:
+        a dataframe with one row per GEOROC date, with the matching GVP 'Eruption Number',
+        'Start Year', 'End Year' (NaN if not found), and 'Match' ('year', 'month' or '').
+        An eruption ending in the GEOROC year is preferred, otherwise an eruption covering this year.
+        If the eruption starts and ends in this year, and the GEOROC month is known,
+        the eruption of this year whose months contain the GEOROC month is preferred.
+
+    """
+    erup = load_eruption_intervals(gvpvname)
+    years = np.asarray(years, dtype=float)
+    # -1 (not found) points to a last NaN value
+    start = np.append(erup['Start Year'], np.nan)
+    end = np.append(erup['End Year'], np.nan)
+
+    # year match
+    k = interval_lookup(erup['ends'], years)
+    k = np.where(k >= 0, k, interval_lookup(erup['spans'], years))
+    level = np.where(k >= 0, 'year', '')
+
+    # month match
+    if not (months is None):
+        months = np.nan_to_num(np.asarray(months, dtype=float))
+        km = interval_lookup(erup['months'], years * 12 + months)
+        refine = (k >= 0) & (months > 0) & (km >= 0) & (start[k] == end[k])
+        k = np.where(refine, km, k)
+        level = np.where(refine, 'month', level)
+
+    return pd.DataFrame({'Eruption Number': np.append(erup['Eruption Number'], np.nan)[k],
+                         'Start Year': start[k], 'End Year': end[k], 'Match': level})
+
     
-def update_chemchart(thisvolcano_name, thisfig, thisdate):
+def update_chemchart(thisvolcano_name, thisfig, thisdate, outliers=True):
     """
 
     Args:
         thisvolcano_name: name of a volcano
         thisfig: the figure being updated
         thisdate: the eruption dates, possibly all
+        outliers: whether outliers (robust z-score above outlierthreshold, see robust_scores) are shown
 
     Returns:
         Updates both the chemical plot based on user's inputs,
@@ -785,30 +1053,29 @@ def update_chemchart(thisvolcano_name, thisfig, thisdate):
 
     # checks if data is present
     if not (thisvolcano_name is None) and not (thisvolcano_name == "start") and thisvolcano_name.upper() in grnames:
-        # loads data
-        dfgeoroc = load_georoc(thisvolcano_name)
-        # extracts by name
-        # removes the nan rows for the 3 chemicals of interest
-        dff = dfgeoroc.dropna(
-            subset=['SIO2(WT%)', 'NA2O(WT%)', 'K2O(WT%)'], how='all')
-          
-        # update dff to detect abnormal chemicals
-        dff = detects_chems(dff, ['SIO2(WT%)', 'NA2O(WT%)', 'K2O(WT%)'], morechems, lbls)   
-               
-        if not ((thisdate == 'all') or (thisdate == 'start')):
-            # recovers and filters by dates
-            if '-' in thisdate:
-                s = thisdate.split('-')
-                mask = (dff['ERUPTION YEAR'] == float(s[0])) & (dff['ERUPTION MONTH'] == float(s[1]))
-                if len(s) == 3:
-                    mask = mask & (dff['ERUPTION DAY'] == float(s[2]))
+        # loads data, sorted by date
+        samples = load_samples(thisvolcano_name)
+        dff = samples['samples']
 
+        if not ((thisdate == 'all') or (thisdate == 'start')):
+            # recovers and filters by dates, before detecting abnormal chemicals
+            s = [float(x) for x in thisdate.split('-')]
+            if len(s) == 3:
+                lo, hi = date_key(s[0], s[1], s[2]), date_key(s[0], s[1], s[2]) + 1
+            elif len(s) == 2:
+                lo, hi = date_key(s[0], s[1], 0), date_key(s[0], s[1] + 1, 0)
             else:
-                mask = dff['ERUPTION YEAR'] == float(thisdate)
+                lo, hi = date_key(s[0], 0, 0), date_key(s[0] + 1, 0, 0)
+            dff = dff.iloc[date_slice(samples['keys'], lo, hi)]
+
+        if not outliers:
+            # samples without score are kept
+            dff = dff[~(dff['OUTLIER SCORE'] > outlierthreshold)]
+
+        # update dff to detect abnormal chemicals
+        # thresholds are those of all the samples of the volcano
+        dff = detects_chems(dff, ['SIO2(WT%)', 'NA2O(WT%)', 'K2O(WT%)'], morechems, lbls, samples['thresholds'])
 
-            dff = dff[mask].dropna(
-                subset=['SIO2(WT%)', 'NA2O(WT%)', 'K2O(WT%)'], how='all')
-            
     else:
         # empty dataframe with right columns
         d = {'SIO2(WT%)': [], 'NA2O(WT%)': [], 'TIO2(WT%)': [], 'AL2O3(WT%)': [], 'FEOT(WT%)': [],
@@ -824,148 +1091,1521 @@ def update_chemchart(thisvolcano_name, thisfig, thisdate):
     return thisfig, dff
     
 
-def update_onedropdown(thisvolcano_name):
+# GEOROC samples of the volcanoes used most recently, ready for TAS diagrams and sorted by date,
+# from the least to the most recently used
+georoc_samples = {}
+
+
+def load_samples(thisvolcano_name):
     """
 
     Args:
-        thisvolcano_name: name of a chosen volcano
+        thisvolcano_name: name of a GEOROC volcano
 
     Returns:
-        Updates eruption dates choice based on volcano name
+        the samples of this volcano prepared by prepare_samples, where the samples also have
+        outlier scores per material (see robust_scores) and their bins in Harker diagrams (see harker_bins).
+        It is computed at the first call for this volcano, then kept in memory,
+        for the samplecachesize volcanoes used most recently.
 
     """
-
-    # checks if data is present
-    if not (thisvolcano_name is None) and not (thisvolcano_name == "start") and thisvolcano_name.upper() in grnames:
-        # extracts by name
-        # loads Georoc data based on volcano_name
-        dfgeoroc = load_georoc(thisvolcano_name)
-
-        # removes the nan rows for the 3 chemicals of interest
-        dff = dfgeoroc.dropna(
-            subset=['SIO2(WT%)', 'NA2O(WT%)', 'K2O(WT%)'], how='all')[chemcols[1:4]]
-        # removes the rows if no date is available, and then removes the duplicate dates
-        dff = dff.dropna(subset=['ERUPTION DAY', 'ERUPTION MONTH', 'ERUPTION YEAR'],
-                         how='all').drop_duplicates().values
-
-        # extracts the dates for display
-        dates = []
-        for d in [list(x) for x in dff]:
-            dd = []
-            for i in range(3):
-                if not(np.isnan(d[i])) and i <= 2:
-                    dd.append(d[i])
-                else:
-                    if i <= 2:     
-                        dd.append(0)
-            dates.append(dd[::-1])
-        # each date is a list
-        dates.sort(key=lambda x: (-x[0], -x[1], -x[2])) 
-        
-        dates_str = []
-        for ymd in dates:
-            dd = ''
-            for d in ymd:
-                if d > 0:
-                    dd += str(int(d)) + '-'
-            dates_str.append(dd[:-1])
-        
-        opts = [{'label': i, 'value': i} for i in ['all'] + [x for x in dates_str]]
+    if thisvolcano_name in georoc_samples.keys():
+        # moves this volcano to the end, as the most recently used
+        georoc_samples[thisvolcano_name] = georoc_samples.pop(thisvolcano_name)
     else:
-        opts = [{'label': i, 'value': i} for i in ['all']]
-    return opts
-    
-    
-def create_georoc_around_gvp():
+        samples = prepare_samples(load_georoc(thisvolcano_name))
+        dff = samples['samples']
+        samples['samples'] = pd.concat([dff, robust_scores(dff, scoredoxides, [material_type(dff)]),
+                                        harker_bins(dff)], axis=1)
+        georoc_samples[thisvolcano_name] = samples
+        # the least recently used volcanoes are removed
+        while len(georoc_samples) > samplecachesize:
+            georoc_samples.pop(next(iter(georoc_samples)))
+
+    return georoc_samples[thisvolcano_name]
+
+
+def prepare_samples(dfgeoroc):
     """
 
     Args:
+        dfgeoroc: GEOROC dataframe of one volcano
 
     Returns:
-        recreates the file GEOROCaroundGVP.csv and returns its content as dataframe
+        a dictionary with
+            * 'samples': the GEOROC samples with at least one of SIO2, NA2O, K2O,
+              cleaned as in detects_chems (missing values replaced by 0, 0 < SIO2 <= 80, FEOT > 0), sorted by date,
+            * 'keys': their date keys (see date_key), in increasing order,
+            * 'stats': statistics of every oxide over these samples (see oxide_stats),
+            * 'thresholds': the values above which FEO, CAO, MGO are abnormal (see chem_thresholds).
 
     """
+    # removes the nan rows for the 3 chemicals of interest
+    dff = dfgeoroc.dropna(subset=['SIO2(WT%)', 'NA2O(WT%)', 'K2O(WT%)'], how='all')
+    # cleans as in detects_chems
+    dff = detects_chems(dff, ['SIO2(WT%)', 'NA2O(WT%)', 'K2O(WT%)'], morechems, lbls)
+    dff = dff.drop(columns=['excess' + mc for mc in morechems] + ['color'])
 
-    gvp_names = dfv[['Volcano Name', 'Latitude', 'Longitude']]
-    gvp_names = gvp_names.append(dfvne[['Volcano Name', 'Latitude', 'Longitude']])
-    # removes unnamed
-    gvp_names = gvp_names[gvp_names['Volcano Name'] != 'Unnamed']
- 
-    # list all file names, takes the folder names from the Mapping folder to have only folders
-    lst_arcs = []
-    path_for_arcs = os.listdir(GeorocGVPmapping_dir)
+    keys = date_key(dff['ERUPTION YEAR'].values, dff['ERUPTION MONTH'].values, dff['ERUPTION DAY'].values)
+    order = np.argsort(keys, kind='stable')
+    stats = oxide_stats(dff, [ox for ox in oxides if ox in list(dff)])
 
-    df_georoc = pd.DataFrame()
-    
-    for folder in path_for_arcs:
-        # lists files in each folder, takes names from the Mapping folder in case different copies of the csv exist
-        tmp_dir = os.path.join(GeorocGVPmapping_dir, '{}'.format(folder))
-        tmp = os.listdir(tmp_dir)
-        # adds the path to include directory 
-        lst_arcs += ['%s' % folder + '/' + f[:-4] + '.csv' for f in tmp]
-        
-    for arc in lst_arcs:
-        # this finds the latest file
-        newarc = fix_pathname(arc)
-        
-        # reads the file
-        dftmp_csv = os.path.join(GeorocDataset_directory, '{}'.format(newarc))
-        dftmp = pd.read_csv(dftmp_csv, low_memory=False, encoding='latin1')
-        if not('Inclusions' in arc) and not('Manual' in arc):
-            # keeps only volcanic rocks
-            dfvol = dftmp[dftmp["ROCK TYPE"] == 'VOL']
-            dfvol = dfvol.drop('ROCK TYPE', 1)
-        else:
-            dfvol = dftmp
-            
-            if 'Inclusions' in arc:    
-                # different names
-                dfvol = dfvol.rename({'LATITUDE (MIN.)': 'LATITUDE MIN'}, axis='columns')
-                dfvol = dfvol.rename({'LATITUDE (MAX.)': 'LATITUDE MAX'}, axis='columns')
-                dfvol = dfvol.rename({'LONGITUDE (MIN.)': 'LONGITUDE MIN'}, axis='columns')
-                dfvol = dfvol.rename({'LONGITUDE (MAX.)': 'LONGITUDE MAX'}, axis='columns')
+    return {'samples': dff.iloc[order], 'keys': keys[order], 'stats': stats,
+            'thresholds': chem_thresholds(stats, morechems)}
 
-        # gathers the GEOROC data of interest (to be displayed on the map)   
-        dfvol = dfvol[['LOCATION', 'LATITUDE MIN', 'LATITUDE MAX', 'LONGITUDE MIN', 'LONGITUDE MAX', 'SAMPLE NAME']]
-        dfvol['arc'] = [arc]*len(dfvol.index)
-        df_georoc = df_georoc.append(dfvol)
-        
-    # GVP volcanoes, latitudes and longitudes
-    gvp_nm = gvp_names['Volcano Name']
-    gvp_lat = gvp_names['Latitude']
-    gvp_long = gvp_names['Longitude']
 
-    colgr = ['LOCATION', 'LATITUDE MIN', 'LATITUDE MAX', 'LONGITUDE MIN', 'LONGITUDE MAX', 'SAMPLE NAME', 'arc']
+def material_type(thisdf):
+    """
 
-    # initializes dataframe to contatin the GEOROC samples matching GVP volcanoes
-    match = pd.DataFrame()
+    Args:
+        thisdf: GEOROC dataframe
 
-    for nm, lt, lg in zip(gvp_nm, gvp_lat, gvp_long):
-        lt_cond = (df_georoc['LATITUDE MIN']-.5 <= lt) & (df_georoc['LATITUDE MAX']+.5 >= lt)
-        lg_cond = (df_georoc['LONGITUDE MIN']-.5 <= lg) & (df_georoc['LONGITUDE MAX']+.5 >= lg)
-        dfgeo = df_georoc[lt_cond & lg_cond][colgr]
-        if len(dfgeo.index) > 0:
-            dfgeo['Volcano Name'] = [nm]*len(dfgeo.index)
-            dfgeo['Latitude'] = [lt]*len(dfgeo.index)
-            dfgeo['Longitude'] = [lg]*len(dfgeo.index)
-            match = match.append(dfgeo)
+    Returns:
+        the material of every sample without its details, e.g. WR for WR [1/2]
 
-    match = match.drop_duplicates()
+    """
+    materials = thisdf['MATERIAL'].astype(str)
+    # there are few distinct materials, so each is only split once
+    return materials.map({mat: mat.split('[')[0].strip() for mat in materials.unique()})
 
-    # group sample names when same location
-    matchgroup = match.groupby(['LOCATION', 'LATITUDE MIN', 'LATITUDE MAX', 'LONGITUDE MIN', 'LONGITUDE MAX',
-                                'arc'])['SAMPLE NAME'].agg(list).to_frame().reset_index()
-    # sometimes the same sample is found in several papers, this just keeps the sample name
-    matchgroup['SAMPLE NAME'] = matchgroup['SAMPLE NAME'].apply(lambda x: list(set([y.split('/')[0].split('[')[0]
-                                                                                    for y in x])))
-    # this shortens and keeps only the first 3 samples 
-    matchgroup['SAMPLE NAME'] = matchgroup['SAMPLE NAME'].apply(lambda x: x if len(x) <= 3
-                                                                else x[0:3] + ['+'+str(len(x)-3)])
-    # this creates a single string out of different sample names attached to one location
-    matchgroup['SAMPLE NAME'] = matchgroup['SAMPLE NAME'].apply(lambda x: " ".join(list(set(x))))
 
-    # match_only_GR.to_csv('GEOROCaroundGVP.csv')
-    matchgroup_csv = os.path.join(GeorocDataset_directory, 'GEOROCaroundGVP.csv')
-    matchgroup.to_csv(matchgroup_csv)
+def robust_scores(thisdf, theseoxides, groups):
+    """
 
-    return matchgroup
+    Args:
+        thisdf: dataframe of samples, with missing values replaced by 0
+        theseoxides: list of oxides (columns of thisdf) to be scored
+        groups: list of columns (or series with the index of thisdf) defining groups of samples,
+                e.g. volcano and material
+
+    Returns:
+        a dataframe with the index of thisdf, containing for every oxide the robust z-score 'Z ' + oxide,
+        that is 0.6745 (value - median) / MAD, where median and MAD (median absolute deviation)
+        are those of the group of the sample. 0 values and oxides missing from thisdf are treated as missing,
+        the score is NaN if the value is missing or MAD is 0.
+        The column 'OUTLIER SCORE' is the largest absolute z-score of the sample.
+
+    """
+    # oxides missing from thisdf are scored as missing values
+    values = thisdf.reindex(columns=theseoxides).astype('float')
+    values = values.where(values > 0)
+    med = values.groupby(groups).transform('median')
+    mad = (values - med).abs().groupby(groups).transform('median')
+    scores = 0.6745 * (values - med) / mad.where(mad > 0)
+
+    scores.columns = ['Z ' + ox for ox in theseoxides]
+    scores['OUTLIER SCORE'] = scores.abs().max(axis=1)
+
+    return scores
+
+
+# columns of GEOROCsamples.csv, besides 'GEOROC NAME'
+samplecols = ['SAMPLE NAME', 'UNIQUE_ID', 'MATERIAL', 'TECTONIC SETTING', 'ROCK',
+              'ERUPTION YEAR', 'ERUPTION MONTH', 'ERUPTION DAY',
+              'LATITUDE MIN', 'LATITUDE MAX', 'LONGITUDE MIN', 'LONGITUDE MAX'] + oxides
+
+
+def create_georoc_samples():
+    """
+
+    Args:
+
+    Returns:
+        recreates the file GEOROCsamples.csv and returns its content as dataframe.
+        It contains the samples of every GEOROC volcano which can be shown in a TAS diagram
+        (see prepare_samples), with their rock name (see guess_rock), their oxides, and their 'GEOROC NAME'.
+        All GEOROC volcanoes are loaded, so this takes a while, it is meant to be run after every data update,
+        the tables computed over all samples (e.g. create_georoc_outliers, create_georoc_majorrocks) then only
+        read this file. The arc store, which is read by the app, is rebuilt from it (see create_georoc_arcs).
+
+    """
+    lst_samples = []
+    for grname in grnames:
+        dff = prepare_samples(load_georoc(grname))['samples'].reindex(columns=samplecols)
+        dff.insert(0, 'GEOROC NAME', grname)
+        lst_samples.append(dff)
+    dfsamples = pd.concat(lst_samples, ignore_index=True)
+
+    dfsamples.to_csv(os.path.join(GeorocDataset_directory, 'GEOROCsamples.csv'), index=False)
+    georoc_sample_table['samples'] = dfsamples
+    # the arc store would otherwise keep the samples of the previous data
+    create_georoc_arcs()
+
+    return dfsamples
+
+
+# content of GEOROCsamples.csv, read at the first use
+georoc_sample_table = {}
+
+
+def load_georoc_samples():
+    """
+
+    Args:
+
+    Returns:
+        the samples of every GEOROC volcano, as computed by create_georoc_samples.
+        The file GEOROCsamples.csv is read at the first call. Creating it loads every GEOROC volcano,
+        which is too long for the app, so an error is raised if it is missing (see georoc_samples_ready).
+
+    """
+    if len(georoc_sample_table) == 0:
+        if not georoc_samples_ready():
+            raise FileNotFoundError(samples_missing_message)
+        georoc_sample_table['samples'] = pd.read_csv(
+            os.path.join(GeorocDataset_directory, 'GEOROCsamples.csv'), low_memory=False,
+            dtype={cl: str for cl in ['GEOROC NAME', 'SAMPLE NAME', 'MATERIAL', 'TECTONIC SETTING', 'ROCK']})
+
+    return georoc_sample_table['samples']
+
+
+# shown instead of the results computed over all samples when GEOROCsamples.csv is missing
+samples_missing_message = 'GEOROCsamples.csv is missing, run create_georoc_samples() from Georoc_functions.py'
+
+
+def georoc_samples_ready():
+    """
+
+    Args:
+
+    Returns:
+        whether the samples of every GEOROC volcano can be loaded (see load_georoc_samples),
+        that is, they are in memory or GEOROCsamples.csv exists
+
+    """
+    return len(georoc_sample_table) > 0 or 'GEOROCsamples.csv' in os.listdir(GeorocDataset_directory)
+
+
+def create_georoc_outliers():
+    """
+
+    Args:
+
+    Returns:
+        recreates the file GEOROCoutliers.csv, which contains the outlier scores (see robust_scores)
+        of every GEOROC sample used in TAS diagrams, per volcano and material, and returns its content as dataframe.
+        The scores are computed at once over GEOROCsamples.csv (see load_georoc_samples),
+        it is meant to be run after every data update.
+        The scores are also computed when a volcano is loaded by the app (see load_samples).
+
+    """
+    dfsamples = load_georoc_samples()
+
+    # scores of all samples at once, per volcano and material
+    dfscores = robust_scores(dfsamples, scoredoxides, [dfsamples['GEOROC NAME'], material_type(dfsamples)])
+    dfscores = pd.concat([dfsamples[['GEOROC NAME', 'SAMPLE NAME', 'UNIQUE_ID', 'MATERIAL', 'ERUPTION YEAR']],
+                          dfscores], axis=1)
+    dfscores.to_csv(os.path.join(GeorocDataset_directory, 'GEOROCoutliers.csv'), index=False)
+
+    return dfscores
+
+
+def rock_samples(materials):
+    """
+
+    Args:
+        materials: the materials of the samples to be kept (see material_type)
+
+    Returns:
+        the samples of GEOROCsamples.csv (see load_georoc_samples) of these materials, with 35 < SIO2 < 80 and FEOT > 0,
+        whose rock names are counted in rock distributions, with their 'material'
+
+    """
+    dfsamples = load_georoc_samples()
+    dfsamples = dfsamples.assign(material=material_type(dfsamples))
+
+    return dfsamples[dfsamples['material'].isin(materials) &
+                     (dfsamples['SIO2(WT%)'] < 80) & (dfsamples['SIO2(WT%)'] > 35) & (dfsamples['FEOT(WT%)'] > 0)]
+
+
+# GVP numbers of mapped volcanoes which are not in the lists of GVP volcanoes
+gvp_missing_numbers = {'Acoculco': 341827, 'Los Azufres': 341824, 'Badi': 221805}
+
+
+def create_georoc_majorrocks(materials=None, threshold=10):
+    """
+
+    Args:
+        materials: the materials for which rocks are counted (see material_type), WR, GL and INC if None
+        threshold: percentage of samples from which a rock is major
+
+    Returns:
+        recreates the file GEOROCmajorrocks.csv and returns its content as dataframe.
+        It contains, for every GEOROC volcano and material, the distribution of its rock types (see guess_rock):
+        the number of 'Samples' of each 'ROCK', their percentage among the samples of the volcano and material
+        with 35 < SIO2 < 80, the 'Rank' of the rock (1 for the most common), and whether it is 'Major'.
+        UNNAMED rocks count in the percentages, but are not listed.
+        It is computed in one pass over GEOROCsamples.csv (see load_georoc_samples).
+
+    """
+    if materials is None:
+        materials = ['WR', 'GL', 'INC']
+    dfsamples = rock_samples(materials)
+
+    keys = ['GEOROC NAME', 'material']
+    dfrocks = dfsamples.groupby(keys + ['ROCK']).size().rename('Samples').reset_index()
+    dfrocks['% of samples'] = (100 * dfrocks['Samples'] /
+                               dfrocks.groupby(keys)['Samples'].transform('sum')).round(1)
+    dfrocks = dfrocks[dfrocks['ROCK'] != 'UNNAMED']
+    dfrocks = dfrocks.sort_values(keys + ['Samples', 'ROCK'], ascending=[True, True, False, True])
+    dfrocks['Rank'] = dfrocks.groupby(keys).cumcount() + 1
+    dfrocks['Major'] = dfrocks['% of samples'] >= threshold
+
+    # GVP names and numbers, of volcanoes with or without known eruptions
+    grlong = dfrocks['GEOROC NAME'].replace(dict_Georoc_sl)
+    dfrocks.insert(0, 'Volcano Name', grlong.map(dict_Georoc_GVP))
+    gvpnumbers = pd.concat([dfv, dfvne]).drop_duplicates(subset='Volcano Name').set_index('Volcano Name')
+    gvpnumbers = gvpnumbers['Volcano Number'].append(pd.Series(gvp_missing_numbers))
+    dfrocks.insert(0, 'Volcano Number', dfrocks['Volcano Name'].map(gvpnumbers).astype('Int64'))
+    # volcanoes which are not in the lists of GVP volcanoes are not kept
+    dfrocks = dfrocks[dfrocks['Volcano Number'].notna()]
+    dfrocks = dfrocks.sort_values('Volcano Number', kind='stable').reset_index(drop=True)
+
+    dfrocks.to_csv(os.path.join(GeorocDataset_directory, 'GEOROCmajorrocks.csv'), index=False)
+
+    return dfrocks
+
+
+def majorrocks_wide(dfrocks, nrocks=5):
+    """
+
+    Args:
+        dfrocks: dataframe of rock types, as computed by create_georoc_majorrocks
+        nrocks: number of major, respectively minor rocks, that are kept
+
+    Returns:
+        the same data with one row per volcano and material, and the columns 'major rock1', '% of major rock1',
+        ..., 'minor rock1', '% of minor rock1', ..., filled with 'No Data' when there are fewer rocks.
+
+    """
+    keys = ['Volcano Number', 'Volcano Name', 'GEOROC NAME', 'material']
+    dfrocks = dfrocks.assign(kind=np.where(dfrocks['Major'], 'major', 'minor'))
+    dfrocks['idx'] = dfrocks.groupby(keys + ['kind']).cumcount() + 1
+    dfrocks = dfrocks[dfrocks['idx'] <= nrocks]
+
+    dfwide = dfrocks.pivot_table(index=keys, columns=['kind', 'idx'], values=['ROCK', '% of samples'],
+                                 aggfunc='first')
+    cols = []
+    for kind in ['major', 'minor']:
+        for idx in range(1, nrocks+1):
+            cols += [('ROCK', kind, idx), ('% of samples', kind, idx)]
+    dfwide = dfwide.reindex(columns=pd.MultiIndex.from_tuples(cols)).fillna('No Data')
+    dfwide.columns = [('' if vl == 'ROCK' else '% of ') + kind + ' rock' + str(idx) for vl, kind, idx in cols]
+
+    return dfwide.reset_index()
+
+
+def rock_consistency(materials=None, threshold=10):
+    """
+
+    Args:
+        materials: the materials of the GEOROC samples which are counted (see material_type), WR, GL and INC if None
+        threshold: percentage of samples from which a GEOROC rock is major
+
+    Returns:
+        a dataframe comparing, for every GVP volcano mapped to GEOROC samples with a rock name, the GVP rocks
+        with the rocks of the GEOROC samples (see rock_samples), using GEOROC_rock_col for GEOROC rock names:
+            * 'Volcano Number', 'Volcano Name', 'GEOROC NAME' (the GEOROC names mapped to it),
+            * 'Samples': the number of GEOROC samples with a rock name,
+            * 'GVP rocks': GVP major rocks, then minor rocks, 'GEOROC rocks': rocks of at least threshold% of
+              the samples, the most common first,
+            * 'Samples of GVP rocks (%)': percentage of samples whose rock is a GVP (major or minor) rock,
+            * 'GVP major rocks found (%)': percentage of GVP major rocks which are GEOROC major rocks,
+            * 'Same main rock': whether the most common GEOROC rock is the first GVP major rock.
+        Volcanoes are sorted by increasing 'Samples of GVP rocks (%)', so possibly mis-mapped volcanoes come first.
+        It is computed in one pass over GEOROCsamples.csv, the GVP names come from the current mapping.
+
+    """
+    if materials is None:
+        materials = ['WR', 'GL', 'INC']
+    dfsamples = rock_samples(materials)
+    # GVP rocks are numbered as in rock_col, unnamed rocks are not counted
+    rockno = dfsamples['ROCK'].map(dict(zip(GEOROC_rocks, [rock_col.index(r) for r in GEOROC_rock_col])))
+    dfsamples = dfsamples[rockno.notna()]
+    # GVP name of every GEOROC name (handles long names)
+    gvpnames = dfsamples['GEOROC NAME'].map({grname: dict_Georoc_GVP.get(dict_Georoc_sl.get(grname, grname))
+                                             for grname in dfsamples['GEOROC NAME'].unique()})
+
+    # number of samples per GVP volcano and rock
+    counts = pd.crosstab(gvpnames, rockno[rockno.notna()].astype(int))
+    counts = counts.reindex(columns=range(len(rock_col)), fill_value=0)
+
+    # position of every rock in the GVP list of major then minor rocks, 0 if not present (see rocks_to_color)
+    dfgvp = pd.concat([dfv, dfvne]).drop_duplicates(subset='Volcano Name').set_index('Volcano Name')
+    # volcanoes which are not in the list of GVP volcanoes are not kept
+    counts = counts[counts.index.isin(dfgvp.index)]
+    gvprocks = dfgvp.loc[counts.index, allrocks].values
+    position = np.zeros(counts.shape, dtype=int)
+    for i, r in enumerate(rock_sorted):
+        fnd = gvprocks == r
+        position[:, i] = np.where(fnd.any(axis=1), fnd.argmax(axis=1) + 1, 0)
+
+    share = counts.values / counts.values.sum(axis=1, keepdims=True)
+    gvpmajor = (position > 0) & (position <= len(majorrocks))
+    georocmajor = 100 * share >= threshold
+    with np.errstate(invalid='ignore', divide='ignore'):
+        found = 100 * (gvpmajor & georocmajor).sum(axis=1) / gvpmajor.sum(axis=1)
+
+    dfcons = pd.DataFrame({
+        'Volcano Number': dfgvp.loc[counts.index, 'Volcano Number'].astype(int).values,
+        'Volcano Name': counts.index,
+        'GEOROC NAME': dfsamples.groupby(gvpnames)['GEOROC NAME'].unique().str.join(', ').loc[counts.index].values,
+        'Samples': counts.values.sum(axis=1),
+        'GVP rocks': [', '.join(np.array(rock_col)[np.argsort(p)][np.sort(p) > 0]) for p in position],
+        'GEOROC rocks': [', '.join(np.array(rock_col)[np.argsort(-sh, kind='stable')][:m.sum()])
+                         for sh, m in zip(share, georocmajor)],
+        'Samples of GVP rocks (%)': (100 * (share * (position > 0)).sum(axis=1)).round(1),
+        'GVP major rocks found (%)': found.round(1),
+        'Same main rock': share.argmax(axis=1) == np.where((position == 1).any(axis=1), (position == 1).argmax(axis=1),
+                                                           -1),
+    })
+
+    return dfcons.sort_values('Samples of GVP rocks (%)', kind='stable').reset_index(drop=True)
+
+
+def harker_bins(thisdf):
+    """
+
+    Args:
+        thisdf: dataframe of samples, with missing values replaced by 0
+
+    Returns:
+        a dataframe with the index of thisdf, with for every oxide of harkeroxides, the column 'HARKER BIN ' + oxide,
+        which contains the bin of the sample in the Harker diagram of this oxide: the SIO2 range harkerxrange
+        and the oxide range [0, harkermax] are both cut into harkerbins bins, and the bin is
+        (oxide bin) * harkerbins + (SIO2 bin). It is -1 if the sample is out of range, or the oxide is missing (0).
+
+    """
+    x = thisdf['SIO2(WT%)'].astype(float).values
+    xbin = np.floor((x - harkerxrange[0]) / (harkerxrange[1] - harkerxrange[0]) * harkerbins)
+
+    bins = {}
+    for ox, my in zip(harkeroxides, harkermax):
+        # oxides missing from thisdf are treated as missing values
+        y = thisdf.reindex(columns=[ox])[ox].astype(float).values
+        ybin = np.floor(y / my * harkerbins)
+        inside = (xbin >= 0) & (xbin < harkerbins) & (y > 0) & (ybin < harkerbins)
+        bins['HARKER BIN ' + ox] = np.where(inside, ybin * harkerbins + xbin, -1).astype(int)
+
+    return pd.DataFrame(bins, index=thisdf.index)
+
+
+def harker_density(thesebins):
+    """
+
+    Args:
+        thesebins: bins of samples in a Harker diagram (see harker_bins)
+
+    Returns:
+        the number of samples per bin, as an array with harkerbins rows (oxide) and harkerbins columns (SIO2)
+
+    """
+    thesebins = np.asarray(thesebins)
+
+    return np.bincount(thesebins[thesebins >= 0], minlength=harkerbins**2).reshape(harkerbins, harkerbins)
+
+
+def sample_arcs(dfsamples):
+    """
+
+    Args:
+        dfsamples: dataframe of samples with their 'GEOROC NAME' (see load_georoc_samples)
+
+    Returns:
+        the arc of every sample, that is the GEOROC file (without folder and extension) of its volcano,
+        the first one if the volcano is found in several files, inclusion and manual files coming last
+
+    """
+    arcs = {}
+    for grname in dfsamples['GEOROC NAME'].unique():
+        # handles long names
+        files = dict_volcano_file.get(dict_Georoc_sl.get(grname, grname), [''])
+        files = sorted(files, key=lambda f: ('Inclusions_comp' in f) or ('ManualDataset' in f))
+        arcs[grname] = os.path.basename(files[0]).replace('.csv', '')
+
+    return dfsamples['GEOROC NAME'].map(arcs)
+
+
+def tas_bins(thisdf):
+    """
+
+    Args:
+        thisdf: dataframe of samples, with missing values replaced by 0
+
+    Returns:
+        the bin of every sample in the TAS diagram: the SIO2 range tasxrange and the NA2O+K2O range tasyrange
+        are cut into tasbins bins, and the bin is (NA2O+K2O bin) * tasbins[0] + (SIO2 bin),
+        -1 if the sample is out of range
+
+    """
+    x = thisdf['SIO2(WT%)'].astype(float).values
+    y = thisdf['NA2O(WT%)'].astype(float).values + thisdf['K2O(WT%)'].astype(float).values
+    xbin = np.floor((x - tasxrange[0]) / (tasxrange[1] - tasxrange[0]) * tasbins[0])
+    ybin = np.floor((y - tasyrange[0]) / (tasyrange[1] - tasyrange[0]) * tasbins[1])
+    inside = (xbin >= 0) & (xbin < tasbins[0]) & (ybin >= 0) & (ybin < tasbins[1])
+
+    return np.where(inside, ybin * tasbins[0] + xbin, -1).astype(int)
+
+
+# TAS bins, tectonic settings, materials and arcs of all GEOROC samples, computed at the first use
+georoc_tas_bins = {}
+# TAS densities of all GEOROC samples, per filter combination, computed at the first use
+tas_densities = {}
+
+
+def tas_density(settings=None, materials=None, arcs=None):
+    """
+
+    Args:
+        settings: tectonic settings of the samples to be counted, all if empty or None
+        materials: materials of the samples to be counted (see material_type), all if empty or None
+        arcs: arcs of the samples to be counted (see sample_arcs), all if empty or None
+
+    Returns:
+        the number of GEOROC samples (from GEOROCsamples.csv) of these settings, materials and arcs per bin
+        of the TAS diagram (see tas_bins), as an array with tasbins[1] rows (NA2O+K2O) and tasbins[0] columns (SIO2).
+        The bins of the samples are computed once, and every filter combination once.
+
+    """
+    if len(georoc_tas_bins) == 0:
+        dfsamples = load_georoc_samples()
+        georoc_tas_bins['bins'] = tas_bins(dfsamples)
+        georoc_tas_bins['TECTONIC SETTING'] = dfsamples['TECTONIC SETTING'].values
+        georoc_tas_bins['MATERIAL'] = material_type(dfsamples).values
+        georoc_tas_bins['ARC'] = sample_arcs(dfsamples).values
+
+    key = tuple(tuple(sorted(values)) if not (values is None) else () for values in [settings, materials, arcs])
+    if not (key in tas_densities.keys()):
+        keep = georoc_tas_bins['bins'] >= 0
+        for values, col in zip(key, ['TECTONIC SETTING', 'MATERIAL', 'ARC']):
+            if len(values) > 0:
+                keep &= np.isin(georoc_tas_bins[col], values)
+        tas_densities[key] = np.bincount(georoc_tas_bins['bins'][keep],
+                                         minlength=tasbins[0] * tasbins[1]).reshape(tasbins[1], tasbins[0])
+
+    return tas_densities[key]
+
+
+def plot_tas_density(thisfig, counts):
+    """
+
+    Args:
+        thisfig: the figure being updated, before the samples are drawn
+        counts: number of samples per bin of the TAS diagram (see tas_density)
+
+    Returns:
+        the figure with the density of samples as background, in shades of gray (log scale)
+
+    """
+    xstep = (tasxrange[1] - tasxrange[0]) / tasbins[0]
+    ystep = (tasyrange[1] - tasyrange[0]) / tasbins[1]
+    thisfig.add_trace(
+        go.Heatmap(
+            x=tasxrange[0] + xstep * (np.arange(tasbins[0]) + .5),
+            y=tasyrange[0] + ystep * (np.arange(tasbins[1]) + .5),
+            # empty bins are not drawn
+            z=np.where(counts > 0, np.log10(np.maximum(counts, 1)).round(2), np.nan),
+            colorscale='Greys',
+            zmin=0,
+            opacity=.6,
+            showscale=False,
+            hovertemplate='log10(GEOROC samples)=%{z}<extra></extra>',
+            name='all GEOROC samples',
+        )
+    )
+
+    return thisfig
+
+
+# the arc store: one file per arc in GeorocDataset/GEOROCarcs, listed in GEOROCarcs.csv
+GeorocArcs_directory = os.path.join(GeorocDataset_directory, 'GEOROCarcs')
+# columns of the files of the arc store, besides the bins of the samples in TAS and Harker diagrams
+arccols = ['GEOROC NAME', 'SAMPLE NAME', 'MATERIAL', 'TECTONIC SETTING', 'ROCK', 'ERUPTION YEAR'] + \
+          scoredoxides + [mc for mc in morechems if not (mc in scoredoxides)]
+arcstorecols = arccols + ['TAS BIN'] + ['HARKER BIN ' + ox for ox in harkeroxides]
+
+
+def create_georoc_arcs():
+    """
+
+    Args:
+
+    Returns:
+        recreates the arc store from GEOROCsamples.csv and returns its list of arcs as dataframe.
+        The samples of every arc (see sample_arcs) are written in their own file GEOROCarcs/arc.pkl,
+        with the columns arccols, their material without details (see material_type),
+        their 'TAS BIN' (see tas_bins) and their bins in Harker diagrams (see harker_bins).
+        The file GEOROCarcs.csv gives the number of samples of every arc and tectonic setting,
+        so that only the files of the chosen arcs or settings are read (see load_arc_samples).
+        Samples of volcanoes without GEOROC file are not stored.
+
+    """
+    dfsamples = load_georoc_samples()
+    dfsamples = dfsamples.assign(ARC=sample_arcs(dfsamples))
+    # missing settings are 0
+    dfsamples['TECTONIC SETTING'] = dfsamples['TECTONIC SETTING'].fillna(0).astype(str)
+    dfsamples = dfsamples[dfsamples['ARC'].fillna('') != '']
+
+    if not os.path.isdir(GeorocArcs_directory):
+        os.mkdir(GeorocArcs_directory)
+
+    for arc, dfarc in dfsamples.groupby('ARC'):
+        dff = dfarc.reindex(columns=arccols).reset_index(drop=True)
+        dff['MATERIAL'] = material_type(dff)
+        dff['TAS BIN'] = tas_bins(dff)
+        dff = pd.concat([dff, harker_bins(dff)], axis=1)
+        dff.to_pickle(os.path.join(GeorocArcs_directory, arc + '.pkl'))
+
+    dfarcs = dfsamples.groupby(['ARC', 'TECTONIC SETTING']).size().reset_index(name='Samples')
+    dfarcs.to_csv(os.path.join(GeorocDataset_directory, 'GEOROCarcs.csv'), index=False)
+    georoc_arcs.clear()
+    georoc_arcs['arcs'] = dfarcs
+    georoc_arc_samples.clear()
+
+    return dfarcs
+
+
+# content of GEOROCarcs.csv, read at the first use, and samples of the arcs used most recently (per arc),
+# from the least to the most recently used
+georoc_arcs = {}
+georoc_arc_samples = {}
+
+
+def load_georoc_arcs():
+    """
+
+    Args:
+
+    Returns:
+        the number of samples of every arc and tectonic setting of the arc store (see create_georoc_arcs).
+        The file GEOROCarcs.csv is read at the first call, and the store is created if it is missing.
+
+    """
+    if len(georoc_arcs) == 0:
+        if 'GEOROCarcs.csv' in os.listdir(GeorocDataset_directory):
+            georoc_arcs['arcs'] = pd.read_csv(os.path.join(GeorocDataset_directory, 'GEOROCarcs.csv'),
+                                              dtype={'ARC': str, 'TECTONIC SETTING': str})
+        else:
+            create_georoc_arcs()
+
+    return georoc_arcs['arcs']
+
+
+def load_arc_samples(arcs=None, settings=None):
+    """
+
+    Args:
+        arcs: arcs of the samples (see sample_arcs), all if empty or None
+        settings: tectonic settings of the samples, all if empty or None
+
+    Returns:
+        the samples of these arcs and settings, from the arc store (see create_georoc_arcs).
+        Only the files of the arcs containing such samples are read, and kept in memory
+        for the arccachesize arcs used most recently.
+
+    """
+    if arcs is None:
+        arcs = []
+    if settings is None:
+        settings = []
+    dfarcs = load_georoc_arcs()
+    keep = np.ones(len(dfarcs.index), dtype=bool)
+    if len(arcs) > 0:
+        keep &= dfarcs['ARC'].isin(arcs).values
+    if len(settings) > 0:
+        keep &= dfarcs['TECTONIC SETTING'].isin(settings).values
+
+    lst_samples = []
+    for arc in dfarcs['ARC'][keep].unique():
+        if arc in georoc_arc_samples.keys():
+            # moves this arc to the end, as the most recently used
+            georoc_arc_samples[arc] = georoc_arc_samples.pop(arc)
+        else:
+            georoc_arc_samples[arc] = pd.read_pickle(os.path.join(GeorocArcs_directory, arc + '.pkl'))
+        lst_samples.append(georoc_arc_samples[arc])
+    # the least recently used arcs are removed
+    while len(georoc_arc_samples) > arccachesize:
+        georoc_arc_samples.pop(next(iter(georoc_arc_samples)))
+
+    if len(lst_samples) == 0:
+        return pd.DataFrame(columns=arcstorecols)
+    dff = pd.concat(lst_samples, ignore_index=True)
+    if len(settings) > 0:
+        dff = dff[dff['TECTONIC SETTING'].isin(settings)]
+
+    return dff
+
+
+def update_arc_chemchart(thisfig, arcs, settings):
+    """
+
+    Args:
+        thisfig: the figure being updated
+        arcs: arcs of the samples (see sample_arcs)
+        settings: tectonic settings of the samples
+
+    Returns:
+        the TAS diagram of all the samples of these arcs and settings (see load_arc_samples), nothing if none is chosen.
+        When there are more than tasthreshold samples, their density is shown instead of the samples.
+        Also the dataframe used to draw the plot
+
+    """
+    if len(arcs) + len(settings) > 0:
+        dff = load_arc_samples(arcs, settings)
+    else:
+        # empty dataframe with right columns
+        dff = pd.DataFrame(columns=arcstorecols)
+
+    thisfig = plot_tas(thisfig)
+    if len(dff.index) > tasthreshold:
+        thesebins = dff['TAS BIN'].values
+        counts = np.bincount(thesebins[thesebins >= 0],
+                             minlength=tasbins[0] * tasbins[1]).reshape(tasbins[1], tasbins[0])
+        thisfig = plot_tas_density(thisfig, counts)
+        thisfig.update_layout(
+            title='<b>Chemical Rock Composition from Georoc</b> (density of ' + str(len(dff.index)) + ' samples)',
+            xaxis_title='SiO<sub>2</sub>(wt%)',
+            yaxis_title='Na<sub>2</sub>O+K<sub>2</sub>O(wt%)',
+            width=1.5*600,
+            height=600,
+        )
+    else:
+        # thresholds are those of the chosen samples
+        dff = detects_chems(dff, ['SIO2(WT%)', 'NA2O(WT%)', 'K2O(WT%)'], morechems, lbls)
+        thisfig = plot_chem(thisfig, dff, ['SIO2(WT%)', 'NA2O(WT%)', 'K2O(WT%)'], lbls)
+
+    return thisfig, dff
+
+
+def read_chunks(thisfile, chunksize):
+    """
+
+    Args:
+        thisfile: path of a CSV file, or of an Excel file (.xlsx, only its first sheet is read)
+        chunksize: number of rows per chunk
+
+    Returns:
+        the rows of the file as successive dataframes of at most chunksize rows,
+        so that the whole file is never held in memory
+
+    """
+    if thisfile.lower().endswith('.xlsx'):
+        # read only mode reads the rows one at a time
+        wb = openpyxl.load_workbook(thisfile, read_only=True)
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = [str(cl) for cl in next(rows, [])]
+        chunk = list(itertools.islice(rows, chunksize))
+        while len(chunk) > 0:
+            yield pd.DataFrame(chunk, columns=header)
+            chunk = list(itertools.islice(rows, chunksize))
+        wb.close()
+    else:
+        for chunk in pd.read_csv(thisfile, chunksize=chunksize, low_memory=False, encoding='latin1'):
+            yield chunk
+
+
+def classify_chunk(dfchunk):
+    """
+
+    Args:
+        dfchunk: dataframe of samples, with oxides named as in GEOROC (e.g. SIO2(WT%), in any case)
+
+    Returns:
+        the samples with FEO normalization (see with_feonorm) and a rock name (see guess_rock),
+        missing oxides are added as in manual data inputs (see load_georoc).
+        A ValueError is raised if SIO2, NA2O or K2O is missing, since no rock could be named.
+
+    """
+    dfchunk.columns = [str(cl).strip().upper() for cl in dfchunk.columns]
+    # rocks are named from the TAS diagram, which needs these oxides
+    missing = [cl for cl in ['SIO2(WT%)', 'NA2O(WT%)', 'K2O(WT%)'] if not (cl in list(dfchunk))]
+    if len(missing) > 0:
+        raise ValueError('missing columns ' + ', '.join(missing))
+    # in case some other oxides are missing
+    for cl in oxides:
+        if not (cl in list(dfchunk)):
+            dfchunk[cl] = np.nan
+    # oxides may be read as text, pairs of measurements keep their first value (as in with_feonorm)
+    # and other text (e.g. <0.1, bdl) is taken as missing
+    for cl in oxides:
+        if dfchunk[cl].dtype == object:
+            dfchunk[cl] = dfchunk[cl].astype(str).str.split('\\').str[0].str.strip()
+        dfchunk[cl] = pd.to_numeric(dfchunk[cl], errors='coerce')
+
+    dfchunk = with_feonorm(dfchunk)
+    dfchunk = guess_rock(dfchunk)
+
+    return dfchunk
+
+
+def classify_file(thisfile, outfile, chunksize=classifychunksize, progress=None):
+    """
+
+    Args:
+        thisfile: path of a CSV or Excel file of samples (see read_chunks)
+        outfile: path of the CSV file where the classified samples are written
+        chunksize: number of rows processed at once
+        progress: function called with the number of rows processed so far after every chunk, if given
+                  (e.g. to update the status of an upload, see update_upload_status)
+
+    Returns:
+        classifies the samples of thisfile chunk by chunk (see classify_chunk), and writes them in outfile.
+        Returns a dictionary with
+            * 'rows': the number of samples,
+            * 'rocks': the number of samples of every rock name,
+            * 'counts': the number of samples per bin of the TAS diagram (see tas_bins),
+            * 'points': SIO2, NA2O+K2O and ROCK of the first taspointbudget samples.
+        Only one chunk and these summaries are in memory at any time.
+
+    """
+    nrows = 0
+    rocks = pd.Series(dtype=int)
+    counts = np.zeros(tasbins[0] * tasbins[1], dtype=int)
+    lst_points = []
+    npoints = 0
+
+    for i, dfchunk in enumerate(read_chunks(thisfile, chunksize)):
+        dfchunk = classify_chunk(dfchunk)
+        dfchunk.to_csv(outfile, mode='w' if i == 0 else 'a', header=(i == 0), index=False)
+
+        rocks = rocks.add(dfchunk['ROCK'].value_counts(), fill_value=0)
+        thesebins = tas_bins(dfchunk)
+        counts += np.bincount(thesebins[thesebins >= 0], minlength=tasbins[0] * tasbins[1])
+        if npoints < taspointbudget:
+            dfpoints = dfchunk[['SIO2(WT%)', 'ROCK']].iloc[:taspointbudget - npoints].copy()
+            dfpoints['NA2O(WT%)+K2O(WT%)'] = dfchunk['NA2O(WT%)'] + dfchunk['K2O(WT%)']
+            lst_points.append(dfpoints)
+            npoints += len(dfpoints.index)
+
+        nrows += len(dfchunk.index)
+        if not (progress is None):
+            progress(nrows)
+
+    if len(lst_points) > 0:
+        dfpoints = pd.concat(lst_points, ignore_index=True)
+    else:
+        dfpoints = pd.DataFrame(columns=['SIO2(WT%)', 'ROCK', 'NA2O(WT%)+K2O(WT%)'])
+
+    return {'rows': nrows, 'rocks': rocks.astype(int).sort_values(ascending=False),
+            'counts': counts.reshape(tasbins[1], tasbins[0]), 'points': dfpoints}
+
+
+# the only directory where uploaded and classified files are written; every process of the app
+# (e.g. the uWSGI workers) reads the uploads from there, so they must run on the same machine
+Classify_directory = os.path.join(tempfile.gettempdir(), 'DashVolcano_classify')
+# extensions of the files which can be classified (see read_chunks)
+classify_extensions = ['.csv', '.txt', '.xlsx']
+
+
+def upload_paths(token, ext=''):
+    """
+
+    Args:
+        token: token of an upload (see register_upload), as sent back by the browser
+        ext: the extension of the uploaded file
+
+    Returns:
+        the paths of the 'upload', of its 'classified' file and of its 'status' file (see upload_status),
+        all in Classify_directory, or None if the token is not a token of register_upload,
+        so that no other path can be built from it
+
+    """
+    if not (isinstance(token, str) and re.fullmatch('[0-9a-f]{32}', token)):
+        return None
+
+    return {'upload': os.path.join(Classify_directory, token + '_upload' + ext),
+            'classified': os.path.join(Classify_directory, token + '_classified.csv'),
+            'status': os.path.join(Classify_directory, token + '_status.json')}
+
+
+def register_upload(content, ext):
+    """
+
+    Args:
+        content: the uploaded file, as bytes
+        ext: the extension of the uploaded file (.csv, .txt or .xlsx)
+
+    Returns:
+        a random token, under which the file and its status are saved in Classify_directory (see upload_paths),
+        so that any process of the app can classify it, show its progress and send it back.
+        Files of other extensions are not saved, their status gives the error.
+        Uploads whose status has not changed for classifyexpiry seconds are removed first (see remove_upload).
+
+    """
+    if not os.path.isdir(Classify_directory):
+        os.makedirs(Classify_directory, exist_ok=True)
+    for fl in os.listdir(Classify_directory):
+        path = os.path.join(Classify_directory, fl)
+        # the file may have been removed meanwhile by another process
+        if fl.endswith('_status.json') and os.path.isfile(path) and \
+                time.time() - os.path.getmtime(path) > classifyexpiry:
+            remove_upload(fl[:-len('_status.json')])
+
+    token = secrets.token_hex(16)
+    paths = upload_paths(token, ext)
+    status = {'ext': ext, 'rows': 0, 'done': False, 'error': ''}
+    if not (ext in classify_extensions):
+        status.update({'done': True, 'error': 'Only CSV and Excel (.xlsx) files can be classified'})
+    # the status is written first, so that expired uploads are always found
+    update_upload_status(token, **status)
+    if not status['done']:
+        with open(paths['upload'], 'wb') as f:
+            f.write(content)
+
+    return token
+
+
+def upload_status(token):
+    """
+
+    Args:
+        token: token of an upload (see register_upload)
+
+    Returns:
+        the status of this upload, as a dictionary with the extension of the uploaded file 'ext',
+        the number of 'rows' classified so far, whether the classification is 'done', and the 'error' if any,
+        or None if there is no such upload
+
+    """
+    paths = upload_paths(token)
+    if paths is None or not os.path.isfile(paths['status']):
+        return None
+    try:
+        with open(paths['status']) as f:
+            return json.load(f)
+    # removed meanwhile by another process
+    except FileNotFoundError:
+        return None
+
+
+def update_upload_status(token, **values):
+    """
+
+    Args:
+        token: token of an upload (see register_upload)
+        values: the values of the status which change (see upload_status)
+
+    Returns:
+        writes the new status of this upload. The file is replaced at once,
+        so that other processes never read a partial status.
+
+    """
+    status = upload_status(token)
+    if status is None:
+        status = {}
+    status.update(values)
+    path = upload_paths(token)['status']
+    with open(path + '.tmp', 'w') as f:
+        json.dump(status, f)
+    os.replace(path + '.tmp', path)
+
+
+def remove_upload(token):
+    """
+
+    Args:
+        token: token of an upload (see register_upload)
+
+    Returns:
+        removes the uploaded and classified files of this upload, and its status, if any
+
+    """
+    status = upload_status(token)
+    if status is None:
+        return
+    paths = upload_paths(token, status.get('ext', ''))
+    for path in [paths['upload'], paths['classified'], paths['status']]:
+        # another process may remove the same files
+        if os.path.isfile(path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def bin_chems(years, thisdf, width):
+    """
+
+    Args:
+        years: years of the samples
+        thisdf: dataframe of chemicals of the samples (same index as years)
+        width: width of the bins, in years (e.g. 1 for years, 10 for decades)
+
+    Returns:
+        a dataframe indexed by the first year of every bin with samples, with columns chemical + ' 25%',
+        chemical + ' 50%' (median), chemical + ' 75%' for the quartiles of every chemical (as in describe),
+        and the number of 'samples' in the bin
+
+    """
+    bins = np.floor(np.asarray(years, dtype=float) / width) * width
+    grouped = thisdf.groupby(bins)
+    cols = [chem + ' ' + q for chem in list(thisdf) for q in ['25%', '50%', '75%']]
+    if len(thisdf.index) == 0:
+        return pd.DataFrame([], columns=cols + ['samples'])
+
+    dfbins = grouped.quantile([.25, .5, .75]).unstack()
+    dfbins.columns = [chem + ' ' + str(int(100*q)) + '%' for chem, q in dfbins.columns]
+    dfbins = dfbins[cols]
+    dfbins['samples'] = grouped.size()
+
+    return dfbins
+
+
+def date_key(year, month, day):
+    """
+
+    Args:
+        year: eruption year(s)
+        month: eruption month(s), 0 if not known
+        day: eruption day(s), 0 if not known
+
+    Returns:
+        integer key(s) year * 10000 + month * 100 + day, which sort as dates
+        (months and days are assumed to be less than 100)
+
+    """
+    return (np.asarray(year, dtype=float) * 10000 + np.asarray(month, dtype=float) * 100
+            + np.asarray(day, dtype=float)).astype(np.int64)
+
+
+def date_slice(keys, lo, hi):
+    """
+
+    Args:
+        keys: sorted date keys
+        lo: first key
+        hi: last key (excluded)
+
+    Returns:
+        the slice of positions whose keys are in [lo, hi)
+
+    """
+    return slice(*np.searchsorted(keys, [lo, hi]))
+
+
+def update_onedropdown(thisvolcano_name):
+    """
+
+    Args:
+        thisvolcano_name: name of a chosen volcano
+
+    Returns:
+        Updates eruption dates choice based on volcano name.
+        Dates are read from GEOROCdates.csv, where volcanoes without dates have no row,
+        they are computed from the GEOROC data of this volcano only if the file is missing, and then kept in memory.
+
+    """
+
+    # checks if data is present
+    if not (thisvolcano_name is None) and not (thisvolcano_name == "start") and thisvolcano_name.upper() in grnames:
+        if len(georoc_dates) == 0 and 'GEOROCdates.csv' in os.listdir(GeorocDataset_directory):
+            # empty dates (only a negative year is known) are kept as empty strings
+            dfdates = pd.read_csv(os.path.join(GeorocDataset_directory, 'GEOROCdates.csv'),
+                                  dtype=str, keep_default_na=False)
+            for nm, dfnm in dfdates.groupby('GEOROC NAME', sort=False):
+                georoc_dates[nm] = list(dfnm['DATE'].values)
+            # the file contains all volcanoes, the others have no date
+            for nm in grnames:
+                if not (nm in georoc_dates.keys()):
+                    georoc_dates[nm] = []
+
+        if not (thisvolcano_name in georoc_dates.keys()):
+            # extracts by name
+            # loads Georoc data based on volcano_name
+            georoc_dates[thisvolcano_name] = date_options(load_georoc(thisvolcano_name))
+
+        opts = [{'label': i, 'value': i} for i in ['all'] + georoc_dates[thisvolcano_name]]
+    else:
+        opts = [{'label': i, 'value': i} for i in ['all']]
+    return opts
+
+
+# eruption dates of GEOROC volcanoes, from GEOROCdates.csv or computed at the first use
+georoc_dates = {}
+
+
+def date_options(dfgeoroc):
+    """
+
+    Args:
+        dfgeoroc: GEOROC dataframe of one volcano
+
+    Returns:
+        the list of distinct eruption dates (year-month-day, missing parts omitted) of samples with
+        at least one of SIO2, NA2O, K2O, most recent first
+
+    """
+    # removes the nan rows for the 3 chemicals of interest
+    dff = dfgeoroc.dropna(
+        subset=['SIO2(WT%)', 'NA2O(WT%)', 'K2O(WT%)'], how='all')[['ERUPTION YEAR', 'ERUPTION MONTH', 'ERUPTION DAY']]
+    # removes the rows if no date is available, 0 is used for missing parts,
+    # and then removes the duplicate dates
+    dff = dff.dropna(how='all').astype(float).fillna(0).drop_duplicates()
+    dff = dff.sort_values(['ERUPTION YEAR', 'ERUPTION MONTH', 'ERUPTION DAY'], ascending=False)
+
+    # extracts the dates for display
+    dates_str = pd.Series('', index=dff.index)
+    for col in list(dff):
+        dates_str += np.where(dff[col] > 0, dff[col].astype(int).astype(str) + '-', '')
+
+    return list(dates_str.str[:-1].values)
+
+
+def create_georoc_dates():
+    """
+
+    Args:
+
+    Returns:
+        recreates the file GEOROCdates.csv, which contains the eruption dates of every GEOROC volcano
+        (as in the date menus), and returns its content as dataframe.
+        All GEOROC volcanoes are loaded, so this takes a while, it is meant to be run after every data update.
+
+    """
+    lst_dates = []
+    for grname in grnames:
+        dates = date_options(load_georoc(grname))
+        lst_dates.append(pd.DataFrame({'GEOROC NAME': [grname] * len(dates), 'DATE': dates}))
+        georoc_dates[grname] = dates
+
+    dfdates = pd.concat(lst_dates, ignore_index=True)
+    dfdates.to_csv(os.path.join(GeorocDataset_directory, 'GEOROCdates.csv'), index=False)
+
+    return dfdates
+    
+    
+def create_georoc_around_gvp():
+    """
+
+    Args:
+
+    Returns:
+        recreates the file GEOROCaroundGVP.csv and returns its content as dataframe
+
+    """
+
+    gvp_names = dfv[['Volcano Name', 'Latitude', 'Longitude']]
+    gvp_names = gvp_names.append(dfvne[['Volcano Name', 'Latitude', 'Longitude']])
+    # removes unnamed
+    gvp_names = gvp_names[gvp_names['Volcano Name'] != 'Unnamed']
+
+    df_georoc = read_georoc_locations()
+
+    colgr = ['LOCATION', 'LATITUDE MIN', 'LATITUDE MAX', 'LONGITUDE MIN', 'LONGITUDE MAX', 'SAMPLE NAME', 'arc']
+
+    # keeps the GEOROC samples whose box, enlarged by .5 degree, contains at least one GVP volcano
+    # the volcanoes are indexed by latitude, instead of scanning all samples for every volcano
+    fnd = boxes_around_points(df_georoc['LATITUDE MIN'].astype(float).values,
+                              df_georoc['LATITUDE MAX'].astype(float).values,
+                              df_georoc['LONGITUDE MIN'].astype(float).values,
+                              df_georoc['LONGITUDE MAX'].astype(float).values,
+                              gvp_names['Latitude'].astype(float).values,
+                              gvp_names['Longitude'].astype(float).values, .5)
+    match = df_georoc[fnd][colgr]
+
+    match = match.drop_duplicates()
+
+    # group sample names when same location
+    matchgroup = group_samples_by_location(match)
+
+    # match_only_GR.to_csv('GEOROCaroundGVP.csv')
+    matchgroup_csv = os.path.join(GeorocDataset_directory, 'GEOROCaroundGVP.csv')
+    matchgroup.to_csv(matchgroup_csv)
+
+    return matchgroup
+
+
+def read_georoc_locations():
+    """
+
+    Args:
+
+    Returns:
+        a dataframe with the location (LOCATION, latitude and longitude ranges), the sample name
+        and the arc file of every volcanic GEOROC sample, read from all the arc files
+
+    """
+    # list all file names, takes the folder names from the Mapping folder to have only folders
+    lst_arcs = []
+    path_for_arcs = os.listdir(GeorocGVPmapping_dir)
+
+    lst_georoc = []
+    
+    for folder in path_for_arcs:
+        # lists files in each folder, takes names from the Mapping folder in case different copies of the csv exist
+        tmp_dir = os.path.join(GeorocGVPmapping_dir, '{}'.format(folder))
+        tmp = os.listdir(tmp_dir)
+        # adds the path to include directory 
+        lst_arcs += ['%s' % folder + '/' + f[:-4] + '.csv' for f in tmp]
+        
+    for arc in lst_arcs:
+        # this finds the latest file
+        newarc = fix_pathname(arc)
+        
+        # reads the file
+        dftmp_csv = os.path.join(GeorocDataset_directory, '{}'.format(newarc))
+        dftmp = pd.read_csv(dftmp_csv, low_memory=False, encoding='latin1')
+        if not('Inclusions' in arc) and not('Manual' in arc):
+            # keeps only volcanic rocks
+            dfvol = dftmp[dftmp["ROCK TYPE"] == 'VOL']
+            dfvol = dfvol.drop('ROCK TYPE', 1)
+        else:
+            dfvol = dftmp
+            
+            if 'Inclusions' in arc:    
+                # different names
+                dfvol = dfvol.rename({'LATITUDE (MIN.)': 'LATITUDE MIN'}, axis='columns')
+                dfvol = dfvol.rename({'LATITUDE (MAX.)': 'LATITUDE MAX'}, axis='columns')
+                dfvol = dfvol.rename({'LONGITUDE (MIN.)': 'LONGITUDE MIN'}, axis='columns')
+                dfvol = dfvol.rename({'LONGITUDE (MAX.)': 'LONGITUDE MAX'}, axis='columns')
+
+        # gathers the GEOROC data of interest (to be displayed on the map)   
+        dfvol = dfvol[['LOCATION', 'LATITUDE MIN', 'LATITUDE MAX', 'LONGITUDE MIN', 'LONGITUDE MAX', 'SAMPLE NAME']]
+        dfvol['arc'] = [arc]*len(dfvol.index)
+        lst_georoc.append(dfvol)
+
+    # concatenates once, appending file after file copies the growing dataframe every time
+    return pd.concat(lst_georoc)
+
+
+def group_samples_by_location(thisdf):
+    """
+
+    Args:
+        thisdf: dataframe of GEOROC samples, as returned by read_georoc_locations
+
+    Returns:
+        a dataframe with one row per location and arc, sample names are shortened and joined into one string
+
+    """
+    # group sample names when same location
+    matchgroup = thisdf.groupby(['LOCATION', 'LATITUDE MIN', 'LATITUDE MAX', 'LONGITUDE MIN', 'LONGITUDE MAX',
+                                 'arc'])['SAMPLE NAME'].agg(list).to_frame().reset_index()
+    # sometimes the same sample is found in several papers, this just keeps the sample name
+    matchgroup['SAMPLE NAME'] = matchgroup['SAMPLE NAME'].apply(lambda x: list(set([y.split('/')[0].split('[')[0]
+                                                                                    for y in x])))
+    # this shortens and keeps only the first 3 samples 
+    matchgroup['SAMPLE NAME'] = matchgroup['SAMPLE NAME'].apply(lambda x: x if len(x) <= 3
+                                                                else x[0:3] + ['+'+str(len(x)-3)])
+    # this creates a single string out of different sample names attached to one location
+    matchgroup['SAMPLE NAME'] = matchgroup['SAMPLE NAME'].apply(lambda x: " ".join(list(set(x))))
+
+    return matchgroup
+
+
+def boxes_around_points(latmin, latmax, lonmin, lonmax, lat, lon, tol):
+    """
+
+    Args:
+        latmin: array of minimum latitudes of the sample boxes
+        latmax: array of maximum latitudes of the sample boxes
+        lonmin: array of minimum longitudes of the sample boxes
+        lonmax: array of maximum longitudes of the sample boxes
+        lat: array of latitudes of the points (GVP volcanoes)
+        lon: array of longitudes of the points (GVP volcanoes)
+        tol: tolerance (in degrees) added on every side of the boxes
+
+    Returns:
+        a boolean array, True for boxes which contain at least one point once enlarged by tol.
+        Points are sorted by latitude, so every box only looks at the points in its latitude band.
+        Longitudes are compared modulo 360, so boxes close to the antimeridian are matched across it.
+
+    """
+    # points with missing coordinates never match
+    keep = ~(np.isnan(lat) | np.isnan(lon))
+    order = np.argsort(lat[keep], kind='stable')
+    slat = lat[keep][order]
+    slon = lon[keep][order]
+
+    fnd = np.zeros(len(latmin), dtype=bool)
+    # a comparison with a missing bound is never true
+    valid = ~(np.isnan(latmin) | np.isnan(latmax) | np.isnan(lonmin) | np.isnan(lonmax))
+
+    # boxes are processed by chunks to bound the number of candidate pairs in memory
+    chunk = 50000
+    for start in range(0, len(latmin), chunk):
+        sl = slice(start, start + chunk)
+        # latitude band of every box: first point >= latmin-tol, first point > latmax+tol
+        lo = np.searchsorted(slat, latmin[sl] - tol, side='left')
+        hi = np.searchsorted(slat, latmax[sl] + tol, side='right')
+        cnt = np.where(valid[sl], np.clip(hi - lo, 0, None), 0)
+        if cnt.sum() == 0:
+            continue
+        # candidate pairs (box, point) within the latitude band
+        box, pt = band_pairs(lo, cnt)
+        # longitude check, the point is also shifted by +-360 for the antimeridian
+        bmin = lonmin[sl][box] - tol
+        bmax = lonmax[sl][box] + tol
+        ok = np.zeros(len(box), dtype=bool)
+        for shift in [0, -360, 360]:
+            ok |= (bmin <= slon[pt] + shift) & (bmax >= slon[pt] + shift)
+        fnd[start + box[ok]] = True
+
+    return fnd
+
+
+def band_pairs(lo, cnt):
+    """
+
+    Args:
+        lo: array, for every query, index of the first sorted point in its band
+        cnt: array, for every query, number of sorted points in its band
+
+    Returns:
+        two arrays listing all (query, point) candidate pairs, points being indices in the sorted order
+
+    """
+    qry = np.repeat(np.arange(len(cnt)), cnt)
+    pt = np.repeat(lo, cnt) + np.arange(cnt.sum()) - np.repeat(np.cumsum(cnt) - cnt, cnt)
+
+    return qry, pt
+
+
+def create_georoc_locations():
+    """
+
+    Args:
+
+    Returns:
+        recreates the file GEOROClocations.csv and returns its content as dataframe.
+        Unlike GEOROCaroundGVP.csv, it contains every GEOROC location, whatever its distance to GVP volcanoes,
+        so it does not depend on any matching tolerance.
+
+    """
+    dfloc = group_samples_by_location(read_georoc_locations().drop_duplicates())
+
+    # center of the sample box, removes weird latitudes
+    dfloc = dfloc[abs(dfloc['LATITUDE MAX']) <= 90]
+    dfloc['Latitude'] = (dfloc['LATITUDE MIN'] + dfloc['LATITUDE MAX']) / 2
+    dfloc['Longitude'] = (dfloc['LONGITUDE MIN'] + dfloc['LONGITUDE MAX']) / 2
+
+    dfloc_csv = os.path.join(GeorocDataset_directory, 'GEOROClocations.csv')
+    dfloc.to_csv(dfloc_csv, index=False)
+
+    return dfloc
+
+
+# GEOROC locations indexed on the unit sphere, filled at the first radius query
+georoc_sphere_index = {}
+
+
+def load_sphere_index():
+    """
+
+    Args:
+
+    Returns:
+        the GEOROC locations (from GEOROClocations.csv, created if missing) and their coordinates
+        on the unit sphere, sorted by z, so that a latitude band is a contiguous slice
+
+    """
+    if len(georoc_sphere_index) == 0:
+        if 'GEOROClocations.csv' in os.listdir(GeorocDataset_directory):
+            # file exists, just reads it
+            dfloc = pd.read_csv(os.path.join(GeorocDataset_directory, 'GEOROClocations.csv'))
+        else:
+            # creates the file
+            dfloc = create_georoc_locations()
+
+        xyz = to_unit_sphere(dfloc['Latitude'].values, dfloc['Longitude'].values)
+        order = np.argsort(xyz[:, 2], kind='stable')
+        georoc_sphere_index['locations'] = dfloc.iloc[order].reset_index(drop=True)
+        georoc_sphere_index['xyz'] = xyz[order]
+
+    return georoc_sphere_index
+
+
+def to_unit_sphere(lat, lon):
+    """
+
+    Args:
+        lat: array of latitudes (degrees)
+        lon: array of longitudes (degrees)
+
+    Returns:
+        an array of shape (n, 3) with the corresponding points on the unit sphere
+
+    """
+    phi = np.radians(np.asarray(lat, dtype=float))
+    lmb = np.radians(np.asarray(lon, dtype=float))
+
+    return np.column_stack([np.cos(phi) * np.cos(lmb), np.cos(phi) * np.sin(lmb), np.sin(phi)])
+
+
+def samples_within_radius(lat, lon, radius):
+    """
+
+    Args:
+        lat: latitude of the query point (e.g. a GVP volcano or a clicked point)
+        lon: longitude of the query point
+        radius: radius in km
+
+    Returns:
+        a dataframe of GEOROC locations within radius km of the point, with their great-circle distance
+        in the column 'Distance (km)', sorted by distance
+
+    """
+    idx = load_sphere_index()
+    xyz = idx['xyz']
+
+    # angular radius, points further than this in latitude cannot be within the radius
+    theta = min(radius / earth_radius, np.pi)
+    phi = np.radians(float(lat))
+    zlo = np.sin(max(phi - theta, -np.pi / 2))
+    zhi = np.sin(min(phi + theta, np.pi / 2))
+    lo = np.searchsorted(xyz[:, 2], zlo, side='left')
+    hi = np.searchsorted(xyz[:, 2], zhi, side='right')
+
+    # great-circle distance from the chord length, only within the band
+    pt = to_unit_sphere([lat], [lon])[0]
+    chord = np.linalg.norm(xyz[lo:hi] - pt, axis=1)
+    dist = earth_radius * 2 * np.arcsin(np.clip(chord / 2, 0, 1))
+
+    near = dist <= radius
+    dfnear = idx['locations'].iloc[lo:hi][near].copy()
+    dfnear['Distance (km)'] = dist[near]
+
+    return dfnear.sort_values('Distance (km)')
+
+
+def samples_near_gvp(radius):
+    """
+
+    Args:
+        radius: radius in km
+
+    Returns:
+        a dataframe of GEOROC locations within radius km of every GVP volcano,
+        with the GVP volcano name and the great-circle distance
+
+    """
+    gvp_names = dfv[['Volcano Name', 'Latitude', 'Longitude']]
+    gvp_names = gvp_names.append(dfvne[['Volcano Name', 'Latitude', 'Longitude']])
+    # removes unnamed
+    gvp_names = gvp_names[gvp_names['Volcano Name'] != 'Unnamed']
+    gvp_lat = gvp_names['Latitude'].astype(float).values
+    gvp_xyz = to_unit_sphere(gvp_lat, gvp_names['Longitude'].astype(float).values)
+
+    idx = load_sphere_index()
+    xyz = idx['xyz']
+
+    # latitude band of every volcano, as in samples_within_radius
+    theta = min(radius / earth_radius, np.pi)
+    phi = np.radians(gvp_lat)
+    lo = np.searchsorted(xyz[:, 2], np.sin(np.clip(phi - theta, -np.pi / 2, None)), side='left')
+    hi = np.searchsorted(xyz[:, 2], np.sin(np.clip(phi + theta, None, np.pi / 2)), side='right')
+    cnt = np.where(np.isnan(phi), 0, np.clip(hi - lo, 0, None))
+
+    # volcanoes are processed by chunks to bound the number of candidate pairs in memory
+    lst_vol = []
+    lst_pt = []
+    lst_dist = []
+    chunk = 100
+    for start in range(0, len(cnt), chunk):
+        sl = slice(start, start + chunk)
+        vol, pt = band_pairs(lo[sl], cnt[sl])
+        vol += start
+        chord = np.linalg.norm(xyz[pt] - gvp_xyz[vol], axis=1)
+        dist = earth_radius * 2 * np.arcsin(np.clip(chord / 2, 0, 1))
+        near = dist <= radius
+        lst_vol.append(vol[near])
+        lst_pt.append(pt[near])
+        lst_dist.append(dist[near])
+
+    vol = np.concatenate(lst_vol)
+    dfnear = idx['locations'].iloc[np.concatenate(lst_pt)].reset_index(drop=True)
+    dfnear['Distance (km)'] = np.concatenate(lst_dist)
+    dfnear['Volcano Name'] = gvp_names['Volcano Name'].values[vol]
+
+    return dfnear
+
+
+def create_georoc_gvp_eruptions():
+    """
+
+    Args:
+
+    Returns:
+        recreates the file GEOROCGVPeruptions.csv and returns its content as dataframe.
+        It contains, for every dated GEOROC sample of a volcano mapped to GVP, its GVP 'Eruption Number',
+        and the quality of the match in 'Match' ('year' or 'month').
+        All GEOROC volcanoes are loaded, so this takes a while, it is meant to be run after every data update.
+
+    """
+    lst_links = []
+    for grname, gvpname in dict_Georoc_GVP.items():
+        # only volcanoes with eruptions can be matched
+        if not (gvpname in lst_names):
+            continue
+        dfgeoroc = load_georoc(grname)
+        dfgeoroc = dfgeoroc[dfgeoroc['ERUPTION YEAR'].notna()]
+        if len(dfgeoroc.index) == 0:
+            continue
+        # months are 0 when not known, as in the TAS dataframes (see detects_chems)
+        dfgeoroc['ERUPTION MONTH'] = dfgeoroc['ERUPTION MONTH'].fillna(0)
+
+        fnd = match_eruptions(gvpname, dfgeoroc['ERUPTION YEAR'].values, dfgeoroc['ERUPTION MONTH'].values)
+        dflinks = pd.DataFrame({'GEOROC NAME': grname, 'Volcano Name': gvpname,
+                                'UNIQUE_ID': dfgeoroc['UNIQUE_ID'].values, 'SAMPLE NAME': dfgeoroc['SAMPLE NAME'].values,
+                                'ERUPTION YEAR': dfgeoroc['ERUPTION YEAR'].values,
+                                'ERUPTION MONTH': dfgeoroc['ERUPTION MONTH'].values,
+                                'Eruption Number': fnd['Eruption Number'].values, 'Match': fnd['Match'].values})
+        lst_links.append(dflinks[dflinks['Eruption Number'].notna()])
+
+    dflinks = pd.concat(lst_links, ignore_index=True)
+    dflinks['Eruption Number'] = dflinks['Eruption Number'].astype(int)
+
+    dflinks_csv = os.path.join(GeorocDataset_directory, 'GEOROCGVPeruptions.csv')
+    dflinks.to_csv(dflinks_csv, index=False)
+    georoc_gvp_eruptions['links'] = dflinks
+
+    return dflinks
+
+
+# content of GEOROCGVPeruptions.csv, read at the first use
+georoc_gvp_eruptions = {}
+
+
+def link_eruptions(thisvolcano_name, thisdf):
+    """
+
+    Args:
+        thisvolcano_name: GEOROC name of a volcano
+        thisdf: GEOROC dataframe for this volcano, as returned by load_georoc (possibly filtered)
+
+    Returns:
+        the rows of thisdf matching a GVP eruption, with the columns 'Eruption Number' and 'Match'.
+        The links are read from GEOROCGVPeruptions.csv, they are computed for this volcano only if the file
+        is missing or does not contain it. The eruption of a sample only depends on its year and month,
+        so the links are joined on these two columns.
+
+    """
+    # handles long names
+    if thisvolcano_name in dict_Georoc_sl.keys():
+        thisvolcano_name = dict_Georoc_sl[thisvolcano_name]
+    # automatic matching
+    if thisvolcano_name in dict_Georoc_GVP.keys():
+        gvpname = dict_Georoc_GVP[thisvolcano_name]
+    else:
+        gvpname = thisvolcano_name.title()
+
+    datecols = ['ERUPTION YEAR', 'ERUPTION MONTH']
+    if len(georoc_gvp_eruptions) == 0 and 'GEOROCGVPeruptions.csv' in os.listdir(GeorocDataset_directory):
+        georoc_gvp_eruptions['links'] = pd.read_csv(os.path.join(GeorocDataset_directory, 'GEOROCGVPeruptions.csv'))
+
+    if len(georoc_gvp_eruptions) > 0 and thisvolcano_name in georoc_gvp_eruptions['links']['GEOROC NAME'].values:
+        dflinks = georoc_gvp_eruptions['links']
+        dflinks = dflinks[dflinks['GEOROC NAME'] == thisvolcano_name]
+    else:
+        # matches the dates of this volcano only
+        dflinks = thisdf[datecols].drop_duplicates()
+        dflinks = dflinks[dflinks['ERUPTION YEAR'].notna() & (dflinks['ERUPTION YEAR'] != 0)]
+        fnd = match_eruptions(gvpname, dflinks['ERUPTION YEAR'].values,
+                              dflinks['ERUPTION MONTH'].values)
+        dflinks = pd.concat([dflinks.reset_index(drop=True), fnd[['Eruption Number', 'Match']]], axis=1)
+        dflinks = dflinks[dflinks['Eruption Number'].notna()]
+
+    dflinks = dflinks[datecols + ['Eruption Number', 'Match']].drop_duplicates(subset=datecols)
+    dflinks['Eruption Number'] = dflinks['Eruption Number'].astype(int)
+
+    return thisdf.merge(dflinks, on=datecols, how='inner')
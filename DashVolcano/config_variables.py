@@ -7,6 +7,8 @@
 #      GVP_Volcano_List.xlsx
 #    * one that contains eruption data, it needs to be named:
 #      GVP_Eruption_Results.xlsx
+#    Eruptions are also grouped by volcano (eruption store), to be retrieved
+#    by volcano name or number without scanning the whole table.
 # 3) It creates an index for GEOROC data, based on the content of the
 #    folder \GeorocGVPmapping.
 #    Due to the sheer size of GEOROC dataset, the GEOROC data
@@ -57,6 +59,14 @@ majorrocks = ['Major Rock ' + str(i) for i in range(1, 6)]
 rock_col = ['Tephrite Basanite', 'Foidite', 'Basalt', 'Andesite', 'Trachyandesite', 'Tephri-phonolite',
             'Dacite', 'Trachyte', 'Phonolite', 'Rhyolite']
 
+# GEOROC names for rocks (as guessed from the TAS diagram) and the corresponding shorter GVP names
+GEOROC_rocks = ['TRACHYBASALT', 'TEPHRITE', 'FOIDITE', 'BASALT', 'PICROBASALT', 'ANDESITE', 'BASALTIC ANDESITE',
+                'TRACHYANDESITE', 'BASALTIC TRACHYANDESITE', 'PHONO-TEPHRITE', 'TEPHRI-PHONOLITE', 'DACITE',
+                'TRACHYTE', 'PHONOLITE', 'RHYOLITE']
+GEOROC_rock_col = ['Tephrite Basanite', 'Tephrite Basanite', 'Foidite', 'Basalt', 'Basalt', 'Andesite', 'Andesite',
+                   'Trachyandesite', 'Trachyandesite', 'Tephri-phonolite', 'Tephri-phonolite', 'Dacite',
+                   'Trachyte', 'Phonolite', 'Rhyolite']
+
 # main rocks
 main_rocks = ['Basalt', 'Andesite', 'Dacite', 'Rhyolite']
 
@@ -147,6 +157,42 @@ oxides = ['SIO2(WT%)', 'TIO2(WT%)', 'B2O3(WT%)', 'AL2O3(WT%)', 'CR2O3(WT%)', 'FE
           'H2O(WT%)', 'H2OP(WT%)', 'H2OM(WT%)', 'H2OT(WT%)', 'CO2(WT%)', 'CO1(WT%)', 'F(WT%)', 'CL(WT%)',
           'CL2(WT%)', 'OH(WT%)', 'CH4(WT%)', 'SO2(WT%)', 'SO3(WT%)', 'SO4(WT%)', 'S(WT%)'] + ['LOI(WT%)']
                       
+# oxides of the TAS and Harker diagrams, for which outlier scores are computed
+scoredoxides = ['SIO2(WT%)', 'TIO2(WT%)', 'AL2O3(WT%)', 'FEOT(WT%)', 'MGO(WT%)', 'CAO(WT%)', 'NA2O(WT%)',
+                'K2O(WT%)', 'P2O5(WT%)']
+
+# Harker diagrams: oxides drawn against SIO2, and the maximum shown for each
+harkeroxides = ['TIO2(WT%)', 'AL2O3(WT%)', 'FEOT(WT%)', 'MGO(WT%)', 'CAO(WT%)', 'NA2O(WT%)', 'K2O(WT%)', 'P2O5(WT%)']
+harkermax = [10, 25, 20, 15, 20, 10, 10, 5]
+# SIO2 range of Harker diagrams, and number of bins of both axes for densities
+harkerxrange = [30, 80]
+harkerbins = 50
+# number of samples from which Harker diagrams show densities instead of samples
+harkerthreshold = 2000
+
+# TAS diagrams: SIO2 and NA2O+K2O ranges, and number of bins of each axis for densities of all samples
+tasxrange = [30, 80]
+tasyrange = [0, 20]
+tasbins = [100, 80]
+# number of samples from which TAS diagrams of whole arcs or tectonic settings show densities instead of samples
+tasthreshold = 5000
+# maximum number of samples drawn in TAS diagrams (the others are decimated, see decimate_samples),
+# and robust z-score above which a sample is an outlier, which is always drawn
+taspointbudget = 5000
+outlierthreshold = 3.5
+# number of samples from which scatter plots are drawn with WebGL (see scatter_type)
+webglthreshold = 1000
+
+# number of volcanoes whose prepared samples are kept in memory by each process (see load_samples)
+samplecachesize = 20
+# number of arcs whose samples are kept in memory by each process (see load_arc_samples)
+arccachesize = 10
+
+# number of rows of uploaded files classified at once (see classify_file)
+classifychunksize = 50000
+# number of seconds after which uploaded and classified files are removed, if not downloaded
+classifyexpiry = 3600
+
 colsrock = ['UNIQUE_ID', 'TECTONIC SETTING', 'MATERIAL', 'LOCATION COMMENT']
 
 # GEOROC
@@ -155,6 +201,13 @@ colorscale = {'none': 'blue', 'FEO(WT%)': '#FA8072', 'CAO(WT%)': '#E9967A',
               'FEO(WT%)+MGO(WT%)': '#FF0000', 'CAO(WT%)+MGO(WT%)': '#B22222',
               'FEO(WT%)+CAO(WT%)+MGO(WT%)': '#8B0000'}
 
+# ************************************************************************************#
+# constants: map
+# ************************************************************************************#
+
+# mean Earth radius (km), for great-circle distances
+earth_radius = 6371.0
+
 # ************************************************************************************#
 # loads GVP eruption data
 # ************************************************************************************#
@@ -208,43 +261,82 @@ df.loc[df["Volcano Number"] == 371080, "Volcano Name"] = 'Langjokull'
 df.loc[df["Volcano Number"] == 221270, "Volcano Name"] = 'Alutu'
 df.loc[df["Volcano Number"] == 300083, "Volcano Name"] = 'Vilyuchik'
 
+# ************************************************************************************#
+# eruption store: confirmed eruptions grouped by volcano
+# ************************************************************************************#
+
+# same rows as df, but the eruptions of one volcano are contiguous (in the order of df, most recent first)
+df_byvolcano = df.sort_values('Volcano Number', kind='stable')
+
+# same rows, with typed columns: years, months and days are (nullable) integers, VEI is float (NaN if unknown)
+eruption_store = pd.DataFrame({'Volcano Number': df_byvolcano['Volcano Number'].astype(int).values,
+                               'Volcano Name': df_byvolcano['Volcano Name'].values,
+                               'Eruption Number': df_byvolcano['Eruption Number'].astype(int).values,
+                               'VEI': pd.to_numeric(df_byvolcano['VEI']).values})
+for col in ['Start Year', 'End Year', 'Start Month', 'End Month', 'Start Day', 'End Day']:
+    eruption_store[col] = pd.to_numeric(df_byvolcano[col]).astype('Int64').values
+eruption_store.index = df_byvolcano.index
+
+# first and last (excluded) rows of each volcano, by volcano number and by name
+vbounds = np.flatnonzero(np.diff(eruption_store['Volcano Number'].values)) + 1
+vbounds = list(zip(np.r_[0, vbounds], np.r_[vbounds, len(eruption_store.index)]))
+eruption_rows_byno = dict(zip(eruption_store['Volcano Number'].values[[b[0] for b in vbounds]], vbounds))
+eruption_rows_byname = dict(zip(eruption_store['Volcano Name'].values[[b[0] for b in vbounds]], vbounds))
+
+
+def volcano_eruptions(volcanoes, typed=True):
+    # volcanoes = a GVP volcano name or number, or a list of them
+    # returns the confirmed eruptions of these volcanoes from the eruption store,
+    # with typed columns, or with the columns of df if typed is False
+    # unknown volcanoes (or volcanoes with no eruption) give no row
+    # rows are in the order of df, also across volcanoes
+    if not isinstance(volcanoes, list):
+        volcanoes = [volcanoes]
+    rows = [eruption_rows_byname.get(v, eruption_rows_byno.get(v, (0, 0))) for v in volcanoes]
+    rows = np.concatenate([np.arange(b[0], b[1]) for b in rows] + [np.arange(0)])
+    if typed:
+        thisdf = eruption_store.iloc[rows]
+    else:
+        thisdf = df_byvolcano.iloc[rows]
+    if len(volcanoes) > 1:
+        thisdf = thisdf.sort_index()
+    return thisdf
+
 
 # function to aggregate VEI data from eruptions (df) with that of volcanoes (dfv)
 def retrieve_vinfo_byno(df1, df2):
     # df1 = volcanos (dfv)
     # df2 = eruptions (df)
+    # returns one row per volcano number of df2 (in order of appearance), with typed columns
 
-    veirock_data = []
     # Unknown sources are already removed
     # All volcano numbers from eruption (df) are present in the volcano df (dfv)
-    for nno in df2['Volcano Number'].unique():
-        datv = [nno]
-        # extracts vei
-        lstvei = list(df2[df2['Volcano Number'] == nno]['VEI'].values)
-        # extracts valid vei
-        valid_vei = [float(x) for x in lstvei if type(x) == str]
-        # reliability
-        rel = len(valid_vei) / len(lstvei)
-        datv.extend([len(lstvei), rel])
-        if rel > 0:
-            # max, mean and min
-            datv.extend([max(valid_vei), sum(valid_vei) / len(valid_vei), min(valid_vei)])
-        else:
-            # uses NaN so the columns of the dataframe are dtype float and not object
-            datv.extend([np.NaN, np.NaN, np.NaN])
-        # extracts rocks (all rocks, both major and minor)
-        rocks_orig = list(df1[df1['Volcano Number'] == nno][allrocks].values[0])
-        # '\xa0' is used when the data is not there
-        rocks = [r for r in rocks_orig if not (r in ['\xa0', 'No Data (checked)'])]
-        ridx = [0] * 10
-        for r in rocks:
-            ridx[rock_sorted.index(r)] = rocks_orig.index(r) + 1
-        # append binary rock composition
-        datv.extend([x if x == 0 else 1 for x in ridx])
-        # append rock composition
-        datv.extend(ridx)
-        veirock_data.append(datv)
-    return veirock_data
+    vnos = df2['Volcano Number'].astype(int)
+    # valid vei are given as strings, missing vei become NaN
+    vei = pd.to_numeric(df2['VEI'], errors='coerce').groupby(vnos, sort=False)
+    # number of eruptions and reliability (fraction of eruptions with a valid vei)
+    # max, mean and min ignore NaN, and are NaN if there is no valid vei
+    veirock_data = pd.DataFrame({'eruption no': vei.size(), 'reliability': vei.count() / vei.size(),
+                                 'max VEI': vei.max(), 'mean VEI': vei.mean(), 'min VEI': vei.min()})
+
+    # extracts rocks (all rocks, both major and minor), one row per volcano and rock position
+    rocks = df1[['Volcano Number'] + allrocks].melt(id_vars='Volcano Number', var_name='position',
+                                                     value_name='rock')
+    rocks['Volcano Number'] = rocks['Volcano Number'].astype(int)
+    # position of the rock in allrocks (starting from 1)
+    rocks['position'] = rocks['position'].map({r: i + 1 for i, r in enumerate(allrocks)})
+    # '\xa0' is used when the data is not there, 'No Data (checked)' is also removed
+    rocks = rocks[rocks['rock'].isin(rock_sorted)]
+    # rock composition: first position of each rock, 0 if not present
+    ridx = rocks.groupby(['Volcano Number', 'rock'])['position'].min().unstack(fill_value=0)
+    ridx = ridx.reindex(index=veirock_data.index, columns=rock_sorted, fill_value=0).fillna(0).astype(int)
+    # binary rock composition
+    veirock_data[rock_col] = (ridx.values > 0).astype(int)
+    # weighted rock composition
+    veirock_data[['Weighted ' + r for r in rock_col]] = ridx.values
+
+    veirock_data.index.name = 'Volcano Number'
+    return veirock_data.reset_index()
 
 
 # volcanoes with no eruption data
@@ -253,13 +345,12 @@ dfvne = dfv[~dfv['Volcano Name'].isin(df['Volcano Name'])]
 # total no of volcanoes
 totalgvp = len(dfv.index)
 
-cols = ['Volcano Number', 'eruption no', 'reliability'] + VEIcols + rock_col + ['Weighted ' + r for r in rock_col]
 # creates a new dataframe containing VEI data and merges with the volcano dataframe (dfv)
 # note that the merging is based on either 'right' or 'left':
 # 'left' means that volcanoes are kept even with no eruptive data
 # 'right' means we only keep volcanoes with eruptions (thus possibly VEI and eruptive events)
 # the only data not considered by taking 'right' is the rock composition
-dfv = dfv.merge(pd.DataFrame(np.array(retrieve_vinfo_byno(dfv, df)), columns=cols), on='Volcano Number', how='right')
+dfv = dfv.merge(retrieve_vinfo_byno(dfv, df), on='Volcano Number', how='right')
 
 # country data is not available with eruption data
 # after merging using 'right', only countries with eruptive data are kept
@@ -268,6 +359,34 @@ lst_countries = sorted(list(dfv['Country'].unique()))
 # using GVP data from Oct 2021, there should be 861 volcanoes with eruptive data
 lst_names = list(dfv['Volcano Name'].unique())
 
+
+# attribute index over volcanoes (with and without eruptions), for faceted filtering
+def create_volcano_index(df1, df2):
+    # df1 = volcanoes with eruptions (dfv)
+    # df2 = volcanoes with no eruption (dfvne)
+    # returns a dictionary with the volcano names, whether they have eruptions, and for every attribute,
+    # a dictionary mapping each value to a bitmap (boolean array) over the volcanoes
+
+    dfall = pd.concat([df1, df2], ignore_index=True)
+    vindex = {'Volcano Name': dfall['Volcano Name'].values,
+              'eruptions': np.r_[np.ones(len(df1.index), dtype=bool), np.zeros(len(df2.index), dtype=bool)]}
+    # one value per volcano
+    for col in ['Country', 'Tectonic Settings', 'Primary Volcano Type']:
+        codes, values = pd.factorize(dfall[col])
+        vindex[col] = {v: codes == i for i, v in enumerate(values)}
+    # major rocks, a volcano may have several (short names are used)
+    vindex['Major Rock'] = {rc: (dfall[majorrocks] == r).any(axis=1).values for r, rc in zip(rock_sorted, rock_col)}
+    # max VEI, 'unknown' if no VEI is known (including volcanoes with no eruption)
+    maxvei = dfall['max VEI'].fillna(-1).astype(int)
+    codes, values = pd.factorize(maxvei)
+    vindex['max VEI'] = {('unknown' if v == -1 else v): codes == i for i, v in enumerate(values)}
+
+    return vindex
+
+
+# this is done before volcano types are replaced by integers
+volcano_index = create_volcano_index(dfv, dfvne)
+
 # replaces string by integers for decision tree
 dfv['Primary Volcano Type'] = dfv['Primary Volcano Type'].replace(shapes, [shapes.index(sp) for sp in shapes])
 
@@ -2,17 +2,22 @@
 #
 # This creates a one-page layout, that hosts side-by-side comparison of two volcanoes,
 # in terms of TAS diagrams, Harker diagrams, and respective known VEI and rocks.
-# Contains two functions:
+# Contains four functions:
 # 1) update_veichart: creates the VEI plot
-# 2) update_oxyde: creates the Harker diagrams
+# 2) update_oxyde: creates the Harker diagrams (densities for many samples)
+# 3) update_rock_table: compares GVP and GEOROC rocks of all volcanoes
+# 4) plot_classified: creates the TAS diagram of uploaded samples (classified by classify_file)
+# (the TAS diagram of whole arcs or tectonic settings is update_arc_chemchart, in Georoc_functions)
 #
 # Author: F. Oggier
 # Last update: Sep 1 2022
 # ************************************************************************************* #
 
+import base64
 import dash
 from dash import dcc
 from dash import html
+from dash import dash_table
 import dash_bootstrap_components as dbc
 from plotly.subplots import make_subplots
 
@@ -52,7 +57,17 @@ layout = html.Div([
                               "The VEI (volcanic explosity index) data is then extracted from ",
                               html.A("GVP", href="https://volcano.si.edu/", target="_blank"),
                               " with major rocks and eruption dates, if any. "
-                              "If a mapping of dates is found between the two, it is indicated.  "],
+                              "If a mapping of dates is found between the two, it is indicated.  "
+                              "Outliers (samples with an oxide far from the median of the samples of the same "
+                              "volcano and material) can be hidden.  "
+                              "The density of all GEOROC samples, possibly filtered by tectonic settings, "
+                              "materials or arcs, can be shown behind the TAS diagrams.  "
+                              "Below, the samples of whole arcs or tectonic settings are shown together, "
+                              "as densities when they are too many.  "
+                              "Your own samples (CSV or Excel file, with GEOROC oxide columns such as SIO2(WT%)) "
+                              "can be uploaded to be classified, the classified table can then be downloaded.  "
+                              "At the bottom, the GVP rocks of every volcano are compared with the rocks of "
+                              "its GEOROC samples (WR, GL and INC), the lowest agreements first.  "],
                     className="description",
                 ),
             ], align='center', className='intro'),
@@ -83,8 +98,14 @@ layout = html.Div([
                     #
                     
                 ], width=3),
-                # empty column to create alignment
+                # outliers of both volcanoes
                 dbc.Col([
+                    dcc.Checklist(
+                        id="outlier-filter",
+                        options=[{'label': 'Hide outliers', 'value': 'hide'}],
+                        value=[],
+                        className='check',
+                    ),
                 ], width=3),
                 # second column
                 dbc.Col([
@@ -114,6 +135,35 @@ layout = html.Div([
             ], align='center', ),
             html.Br(),
 
+            # *************************************************#
+            # density of all GEOROC samples
+            # **************************************************#
+            dbc.Row([
+                dbc.Col([
+                    dcc.Checklist(
+                        id="tasdensity-filter",
+                        options=[{'label': 'All GEOROC samples', 'value': 'density'}],
+                        value=[],
+                        className='check',
+                    ),
+                ], width=3),
+                dbc.Col([
+                    html.Div(children="Tectonic settings", className="menu-title"),
+                    dcc.Dropdown(id="setting-filter", options=[], value=[], multi=True),
+                ], width=3),
+                dbc.Col([
+                    html.Div(children="Materials", className="menu-title"),
+                    dcc.Dropdown(id="material-filter",
+                                 options=[{"label": mat, "value": mat} for mat in ['WR', 'GL', 'INC', 'MIN']],
+                                 value=[], multi=True),
+                ], width=3),
+                dbc.Col([
+                    html.Div(children="Arcs", className="menu-title"),
+                    dcc.Dropdown(id="arc-filter", options=[], value=[], multi=True),
+                ], width=3),
+            ], align='center', ),
+            html.Br(),
+
             # *************************************************#
             # chemical plots and GVP events
             # **************************************************#
@@ -149,6 +199,96 @@ layout = html.Div([
                         dcc.Graph(id="vei-chart2"),
                     ),
                 ], className="card"),
+            ], align='center'),
+            html.Br(),
+
+            # *************************************************#
+            # TAS and Harker diagrams of whole arcs or tectonic settings
+            # **************************************************#
+            dbc.Row([
+                dbc.Col([
+                    html.Div(children="GEOROC samples of whole arcs or tectonic settings", className="menu-title"),
+                    html.Div(
+                        html.Button('Load arcs', id='button-arcs', n_clicks=0),
+                    ),
+                ], width=3),
+                dbc.Col([
+                    html.Div(children="Arcs", className="menu-title"),
+                    dcc.Dropdown(id="arcview-filter", options=[], value=[], multi=True),
+                ], width=3),
+                dbc.Col([
+                    html.Div(children="Tectonic settings", className="menu-title"),
+                    dcc.Dropdown(id="arcsetting-filter", options=[], value=[], multi=True),
+                ], width=3),
+            ], align='center', ),
+            html.Br(),
+            dbc.Row([
+                dbc.Col([
+                    html.Div(
+                        dcc.Graph(id="arc-chart-georoc"),
+                    ),
+                ], className="card"),
+                dbc.Col([
+                    html.Div(
+                        dcc.Graph(id='arc-oxyde-chart', style={'height': '1000px'}),
+                    ),
+                ], className="card"),
+            ], align='center'),
+            html.Br(),
+
+            # *************************************************#
+            # classification of uploaded samples
+            # **************************************************#
+            dbc.Row([
+                dbc.Col([
+                    html.Div(children="Classify your samples", className="menu-title"),
+                    dcc.Upload(
+                        id='upload-samples',
+                        children=html.Div(['Drag and drop or ', html.A('select a CSV or Excel file')]),
+                        style={'borderWidth': '1px', 'borderStyle': 'dashed', 'textAlign': 'center'},
+                    ),
+                    html.Div(id='classify-progress'),
+                    # only polls while a file is classified
+                    dcc.Interval(id='classify-interval', interval=2000, disabled=True),
+                    html.Br(),
+                    html.Div(
+                        html.Button('Download', id='button-classify', n_clicks=0),
+                    ),
+                    dcc.Download(id='classify-download'),
+                    dcc.Store(id='classify-token'),
+                    html.Br(),
+                    dash_table.DataTable(
+                        id='classify-table',
+                        page_size=20,
+                        style_cell={'textAlign': 'left'},
+                    ),
+                ], width=3),
+                dbc.Col([
+                    html.Div(
+                        dcc.Graph(id="classify-chart"),
+                    ),
+                ], className="card"),
+            ], align='center'),
+            html.Br(),
+
+            # *************************************************#
+            # GVP and GEOROC rocks of all volcanoes
+            # **************************************************#
+            dbc.Row([
+                dbc.Col([
+                    html.Div(children="GVP and GEOROC rocks of all volcanoes", className="menu-title"),
+                    html.Div(
+                        html.Button('Compare', id='button-rocks', n_clicks=0),
+                    ),
+                    html.Br(),
+                    dash_table.DataTable(
+                        id='rock-table',
+                        sort_action='native',
+                        filter_action='native',
+                        page_size=20,
+                        style_cell={'textAlign': 'left', 'whiteSpace': 'normal', 'height': 'auto'},
+                    ),
+                ], className="card"),
             ], align='center')
         ]),
     ),
@@ -206,6 +346,85 @@ def set_date_options2(volcano_name2):
     return opts2, 'all'
 
 
+# part 3
+@app.callback(
+    [
+        dash.dependencies.Output("setting-filter", "options"),
+        dash.dependencies.Output("arc-filter", "options"),
+        dash.dependencies.Output("setting-filter", "placeholder"),
+    ],
+    # from check list
+    dash.dependencies.Input("tasdensity-filter", "value"),
+)
+def set_density_options(tasdensity):
+    """
+
+    Args:
+        tasdensity: whether the density of all GEOROC samples is shown
+
+    Returns:
+        Updates the tectonic settings and arcs of GEOROC samples, once the density is shown,
+        or tells how to compute the samples of all volcanoes if they are missing
+
+    """
+    placeholder = 'Select...'
+    if len(tasdensity) > 0 and not georoc_samples_ready():
+        settings = []
+        arcs = []
+        placeholder = samples_missing_message
+    elif len(tasdensity) > 0:
+        # reads the samples of all volcanoes
+        dfsamples = load_georoc_samples()
+        # missing settings are 0
+        settings = sorted([x for x in dfsamples['TECTONIC SETTING'].dropna().astype(str).unique()
+                           if not (x in ['0', '0.0'])])
+        arcs = sorted(sample_arcs(dfsamples).unique())
+    else:
+        settings = []
+        arcs = []
+
+    return [{"label": x, "value": x} for x in settings], [{"label": x, "value": x} for x in arcs], placeholder
+
+
+# part 4
+@app.callback(
+    [
+        dash.dependencies.Output("arcview-filter", "options"),
+        dash.dependencies.Output("arcsetting-filter", "options"),
+        dash.dependencies.Output("arcview-filter", "placeholder"),
+    ],
+    # from button
+    dash.dependencies.Input("button-arcs", "n_clicks"),
+)
+def set_arc_options(button):
+    """
+
+    Args:
+        button: load arcs button
+
+    Returns:
+        Updates the arcs and tectonic settings of the arc store (see load_georoc_arcs), once the button is clicked,
+        or tells how to compute the samples of all volcanoes if the store cannot be created
+
+    """
+    placeholder = 'Select...'
+    if button >= 1 and not ('GEOROCarcs.csv' in os.listdir(GeorocDataset_directory)) and \
+            not georoc_samples_ready():
+        arcs = []
+        settings = []
+        placeholder = samples_missing_message
+    elif button >= 1:
+        dfarcs = load_georoc_arcs()
+        arcs = sorted(dfarcs['ARC'].unique())
+        # missing settings are 0
+        settings = sorted([x for x in dfarcs['TECTONIC SETTING'].unique() if not (x in ['0', '0.0'])])
+    else:
+        arcs = []
+        settings = []
+
+    return [{"label": x, "value": x} for x in arcs], [{"label": x, "value": x} for x in settings], placeholder
+
+
 # ************************************#
 #
 # callbacks for figure updates
@@ -225,15 +444,27 @@ def set_date_options2(volcano_name2):
         dash.dependencies.Input("region-filter", "value"),
         # from date drop down
         dash.dependencies.Input("erup-filter", "value"),
+        # from check list
+        dash.dependencies.Input("outlier-filter", "value"),
+        # density of all samples, and its filters
+        dash.dependencies.Input("tasdensity-filter", "value"),
+        dash.dependencies.Input("setting-filter", "value"),
+        dash.dependencies.Input("material-filter", "value"),
+        dash.dependencies.Input("arc-filter", "value"),
 
     ],
 )
-def update_charts_rock_vei(volcano_name, date):
+def update_charts_rock_vei(volcano_name, date, hideoutliers, tasdensity, settings, materials, arcs):
     """
 
     Args:
         volcano_name: name of volcano
         date: eruptions dates, possibly all
+        hideoutliers: whether outliers are hidden
+        tasdensity: whether to show the density of all GEOROC samples
+        settings: tectonic settings of the samples of the density
+        materials: materials of the samples of the density
+        arcs: arcs of the samples of the density
 
     Returns:
         Updates plots based on user's inputs, for first volcano
@@ -242,7 +473,9 @@ def update_charts_rock_vei(volcano_name, date):
 
     # first figure
     fig = go.Figure()
-    fig, tmp = update_chemchart(volcano_name, fig, date)
+    if len(tasdensity) > 0 and georoc_samples_ready():
+        fig = plot_tas_density(fig, tas_density(settings, materials, arcs))
+    fig, tmp = update_chemchart(volcano_name, fig, date, len(hideoutliers) == 0)
     figa = update_oxyde(tmp)
 
     # second figure
@@ -266,15 +499,27 @@ def update_charts_rock_vei(volcano_name, date):
         dash.dependencies.Input("region-filter2", "value"),
         # from date drop down
         dash.dependencies.Input("erup-filter2", "value"),
+        # from check list
+        dash.dependencies.Input("outlier-filter", "value"),
+        # density of all samples, and its filters
+        dash.dependencies.Input("tasdensity-filter", "value"),
+        dash.dependencies.Input("setting-filter", "value"),
+        dash.dependencies.Input("material-filter", "value"),
+        dash.dependencies.Input("arc-filter", "value"),
      
     ]
 )
-def update_charts_rock_vei2(volcano_name2, date2):
+def update_charts_rock_vei2(volcano_name2, date2, hideoutliers, tasdensity, settings, materials, arcs):
     """
 
     Args:
         volcano_name2: name of a volcano
         date2: eruptions dates, possibly all
+        hideoutliers: whether outliers are hidden
+        tasdensity: whether to show the density of all GEOROC samples
+        settings: tectonic settings of the samples of the density
+        materials: materials of the samples of the density
+        arcs: arcs of the samples of the density
 
     Returns:
         Updates plots based on user's inputs, for second volcano
@@ -283,7 +528,9 @@ def update_charts_rock_vei2(volcano_name2, date2):
 
     # first figure
     fig = go.Figure()
-    fig, tmp = update_chemchart(volcano_name2, fig, date2)
+    if len(tasdensity) > 0 and georoc_samples_ready():
+        fig = plot_tas_density(fig, tas_density(settings, materials, arcs))
+    fig, tmp = update_chemchart(volcano_name2, fig, date2, len(hideoutliers) == 0)
     figa = update_oxyde(tmp)
 
     # second figure
@@ -292,6 +539,38 @@ def update_charts_rock_vei2(volcano_name2, date2):
 
     return fig, fig2, figa
 
+
+# part 3
+@app.callback(
+    [
+        dash.dependencies.Output("arc-chart-georoc", "figure"),
+        dash.dependencies.Output('arc-oxyde-chart', 'figure'),
+    ],
+    [
+        # from drop downs
+        dash.dependencies.Input("arcview-filter", "value"),
+        dash.dependencies.Input("arcsetting-filter", "value"),
+    ]
+)
+def update_charts_arcs(arcs, settings):
+    """
+
+    Args:
+        arcs: arcs of the samples
+        settings: tectonic settings of the samples
+
+    Returns:
+        Updates the TAS and Harker diagrams of all the samples of these arcs and settings,
+        which are read from the arc store (see load_arc_samples)
+
+    """
+    fig = go.Figure()
+    fig, tmp = update_arc_chemchart(fig, arcs, settings)
+    figa = update_oxyde(tmp)
+
+    return fig, figa
+
+
 # ********************************************************#
 #
 # Functions for the 3rd and 4rth callback
@@ -485,44 +764,292 @@ def update_oxyde(thisdf):
         thisdf: dataframe computed for the above TAS diagram 
 
     Returns:
-        a figure containing a Harker diagram
+        a figure containing a Harker diagram, which shows the density of samples instead of the samples
+        when there are more than harkerthreshold samples (using the bins of the samples, see harker_bins)
 
     """
 
     thisfig = make_subplots(rows=4, cols=2)
     thisfig.update_layout(title='<b>Harker Diagrams from GEOROC</b> <br>', )
 
-    harkerchems = ['TIO2(WT%)', 'AL2O3(WT%)', 'FEOT(WT%)', 'MGO(WT%)', 'CAO(WT%)', 'NA2O(WT%)', 'K2O(WT%)', 'P2O5(WT%)']
     harkerrows = [1, 1, 2, 2, 3, 3, 4, 4]
     harkercols = [1, 2, 1, 2, 1, 2, 1, 2]
 
-    for chem, thisrow, thiscol in zip(harkerchems, harkerrows, harkercols):
-        thisfig.add_traces(
-            go.Scatter(
-                x=thisdf['SIO2(WT%)'],
-                y=thisdf[chem],
-                mode='markers',
-                marker=dict(symbol='circle'),
-                name=chem,
-                showlegend=False,
-            ),
-            rows=thisrow, cols=thiscol,
-        )
+    # the size of densities only depends on the number of bins
+    density = len(thisdf.index) > harkerthreshold and ('HARKER BIN ' + harkeroxides[0]) in list(thisdf)
+    if density:
+        thisfig.update_layout(title='<b>Harker Diagrams from GEOROC</b> (density of ' + str(len(thisdf.index))
+                                    + ' samples)<br>', )
+        # middle of the SIO2 bins
+        xstep = (harkerxrange[1] - harkerxrange[0]) / harkerbins
+        xbins = harkerxrange[0] + xstep * (np.arange(harkerbins) + .5)
+
+    for chem, my, thisrow, thiscol in zip(harkeroxides, harkermax, harkerrows, harkercols):
+        if density:
+            counts = harker_density(thisdf['HARKER BIN ' + chem].values)
+            thisfig.add_traces(
+                go.Heatmap(
+                    x=xbins,
+                    y=my / harkerbins * (np.arange(harkerbins) + .5),
+                    # empty bins are not drawn
+                    z=np.where(counts > 0, counts, np.nan),
+                    colorscale='Blues',
+                    showscale=False,
+                    hovertemplate='SIO2=%{x}<br>' + chem + '=%{y}<br>%{z} samples',
+                    name=chem,
+                ),
+                rows=thisrow, cols=thiscol,
+            )
+        else:
+            thisfig.add_traces(
+                scatter_type(len(thisdf.index))(
+                    x=thisdf['SIO2(WT%)'],
+                    y=thisdf[chem],
+                    mode='markers',
+                    marker=dict(symbol='circle'),
+                    name=chem,
+                    showlegend=False,
+                ),
+                rows=thisrow, cols=thiscol,
+            )
 
     # Update x-axis properties
     thisfig.update_xaxes(title_text="SiO<sub>2</sub>(wt%)", row=4, col=1)
     thisfig.update_xaxes(title_text="SiO<sub>2</sub>(wt%)", row=4, col=2)
     for r in range(1, 5):
         for c in range(1, 3):
-            thisfig.update_xaxes(range=[30, 80], row=r, col=c)
+            thisfig.update_xaxes(range=harkerxrange, row=r, col=c)
 
     # Update yaxis properties
     titles = ["TiO<sub>2</sub>(wt%)", "Al<sub>2</sub>O<sub>3</sub>(wt%)", "FeOT(wt%)", "MgO(wt%)",
               "CaO(wt%)", "Na<sub>2</sub>O(wt%)", "K<sub>2</sub>O(wt%)", "P<sub>2</sub>O<sub>5</sub>(wt%)"]
-    maxy = [10, 25, 20, 15, 20, 10, 10, 5]
 
-    for title, my, thisrow, thiscol in zip(titles, maxy, harkerrows, harkercols):
+    for title, my, thisrow, thiscol in zip(titles, harkermax, harkerrows, harkercols):
         thisfig.update_yaxes(title_text=title, row=thisrow, col=thiscol)
         thisfig.update_yaxes(range=[0, my], row=thisrow, col=thiscol)
 
     return thisfig
+
+
+# ************************************#
+#
+# callback for the rock comparison
+#
+# ************************************#
+@app.callback(
+    [
+        dash.dependencies.Output("rock-table", "data"),
+        dash.dependencies.Output("rock-table", "columns"),
+    ],
+    # from button
+    dash.dependencies.Input("button-rocks", "n_clicks"),
+)
+def update_rock_table(button):
+    """
+
+    Args:
+        button: compare button
+
+    Returns:
+        the comparison of GVP and GEOROC rocks of all volcanoes (see rock_consistency), once the button is clicked,
+        or how to compute the samples of all volcanoes if they are missing
+
+    """
+    if button >= 1 and not georoc_samples_ready():
+        dfcons = pd.DataFrame({'Message': [samples_missing_message]})
+    elif button >= 1:
+        dfcons = rock_consistency()
+        # booleans are not displayed by tables
+        dfcons['Same main rock'] = dfcons['Same main rock'].map({True: 'yes', False: 'no'})
+    else:
+        dfcons = pd.DataFrame()
+
+    return dfcons.to_dict('records'), [{'name': col, 'id': col} for col in list(dfcons)]
+
+
+# ************************************#
+#
+# callbacks for uploaded samples
+#
+# ************************************#
+# part 1
+@app.callback(
+    dash.dependencies.Output("classify-token", "data"),
+    # from upload
+    dash.dependencies.Input("upload-samples", "contents"),
+    dash.dependencies.State("upload-samples", "filename"),
+)
+def start_upload(contents, filename):
+    """
+
+    Args:
+        contents: content of the uploaded file, base64 encoded
+        filename: name of the uploaded file
+
+    Returns:
+        the token of the upload (see register_upload), the file is classified by the next callback,
+        so that its progress can be shown meanwhile
+
+    """
+    token = None
+    if not (contents is None):
+        token = register_upload(base64.b64decode(contents.split(',')[1]), os.path.splitext(filename)[1].lower())
+
+    return token
+
+
+# part 2
+@app.callback(
+    [
+        dash.dependencies.Output("classify-chart", "figure"),
+        dash.dependencies.Output("classify-table", "data"),
+        dash.dependencies.Output("classify-table", "columns"),
+    ],
+    # from upload
+    dash.dependencies.Input("classify-token", "data"),
+)
+def classify_upload(token):
+    """
+
+    Args:
+        token: token of the upload (see register_upload)
+
+    Returns:
+        the TAS diagram and the number of samples per rock of the uploaded samples (see classify_file)
+
+    """
+    result = None
+    message = ''
+    # the upload may have been saved by another process, its files are found from the token only
+    status = upload_status(token)
+    if not (status is None):
+        message = status['error']
+        if not status['done']:
+            # the file is read chunk by chunk, the progress is written in the status of the upload
+            paths = upload_paths(token, status['ext'])
+            try:
+                result = classify_file(paths['upload'], paths['classified'],
+                                       progress=lambda rows: update_upload_status(token, rows=rows))
+            # unreadable uploads (encoding, format, no oxide columns) are reported instead of raised
+            except Exception as e:
+                message = 'The file could not be classified: ' + str(e)
+            os.remove(paths['upload'])
+            update_upload_status(token, done=True, error=message)
+        if result is None:
+            # nothing to download
+            remove_upload(token)
+
+    fig = plot_classified(go.Figure(), result)
+    if result is None:
+        dfrocks = pd.DataFrame()
+        if message != '':
+            dfrocks = pd.DataFrame({'Message': [message]})
+    else:
+        dfrocks = result['rocks'].rename_axis('Rock').reset_index(name='Samples')
+
+    return fig, dfrocks.to_dict('records'), [{'name': col, 'id': col} for col in list(dfrocks)]
+
+
+# part 3
+@app.callback(
+    dash.dependencies.Output("classify-download", "data"),
+    # from button
+    dash.dependencies.Input("button-classify", "n_clicks"),
+    dash.dependencies.State("classify-token", "data"),
+)
+def download_classified(button, token):
+    """
+
+    Args:
+        button: download button
+        token: token of the upload (see register_upload)
+
+    Returns:
+        downloads the classified samples, once the button is clicked, then removes the files of the upload.
+        Only classified files of valid tokens are sent (see upload_paths).
+
+    """
+    # the token comes from the browser, only the path of its classified file is built from it
+    paths = upload_paths(token)
+    if button >= 1 and not (paths is None) and os.path.isfile(paths['classified']):
+        data = dcc.send_file(paths['classified'], filename='classified_samples.csv')
+        remove_upload(token)
+        return data
+
+    return None
+
+
+# part 4
+@app.callback(
+    [
+        dash.dependencies.Output("classify-progress", "children"),
+        dash.dependencies.Output("classify-interval", "disabled"),
+    ],
+    [
+        # from interval
+        dash.dependencies.Input("classify-interval", "n_intervals"),
+        # from upload
+        dash.dependencies.Input("classify-token", "data"),
+    ]
+)
+def update_classify_progress(n, token):
+    """
+
+    Args:
+        n: number of intervals so far
+        token: token of the upload (see register_upload)
+
+    Returns:
+        the number of samples of this upload classified so far,
+        and whether to stop polling, that is, once the classification is done or if there is no upload
+
+    """
+    # the classification runs in another process, which writes its progress in the status of the upload
+    status = upload_status(token)
+    if not (status is None):
+        return str(status['rows']) + ' samples classified', status['done']
+
+    return '', True
+
+
+def plot_classified(thisfig, thisresult):
+    """
+
+    Args:
+        thisfig: the figure being updated
+        thisresult: uploaded samples, as classified by classify_file, possibly None
+
+    Returns:
+        a TAS diagram of the uploaded samples, showing their density when they are more than taspointbudget
+
+    """
+    thisfig = plot_tas(thisfig)
+    thisfig.update_layout(
+        title='<b>Chemical Rock Composition of uploaded samples</b>',
+        xaxis_title='SiO<sub>2</sub>(wt%)',
+        yaxis_title='Na<sub>2</sub>O+K<sub>2</sub>O(wt%)',
+        width=1.5*600,
+        height=600,
+    )
+    if thisresult is None:
+        return thisfig
+
+    if thisresult['rows'] > taspointbudget:
+        thisfig = plot_tas_density(thisfig, thisresult['counts'])
+        thisfig.update_layout(title='<b>Chemical Rock Composition of uploaded samples</b> (density of '
+                                    + str(thisresult['rows']) + ' samples)', )
+    else:
+        dfpoints = thisresult['points']
+        thisfig.add_trace(
+            scatter_type(len(dfpoints.index))(
+                x=dfpoints['SIO2(WT%)'],
+                y=dfpoints['NA2O(WT%)+K2O(WT%)'],
+                customdata=dfpoints['ROCK'],
+                hovertemplate='x=%{x}<br>y=%{y}<br>%{customdata}',
+                mode='markers',
+                marker=dict(color='cornflowerblue', size=12, line=dict(width=2, color='DarkSlateGrey')),
+                name='uploaded samples',
+            ),
+        )
+
+    return thisfig
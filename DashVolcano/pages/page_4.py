@@ -5,6 +5,8 @@
 # 2) displays_map_samples: draws the map
 # 3) update_tas: draws the TAS diagram, possibly with selected points
 # 4) download_tasdata: downloads the TAS data
+# 5) add_radius_samples: adds the GEOROC samples within a radius of a volcano or clicked point
+# 6) color_gvp: colors GVP volcanoes by database or by rock composition
 #
 # Author: F. Oggier
 # Last update: Sep 3 2022
@@ -18,6 +20,7 @@ import dash_bootstrap_components as dbc
 
 # links to the main app
 from DashVolcano.app import app
+from DashVolcano.GVP_functions import *
 from DashVolcano.Georoc_functions import *
 
 # *************************#
@@ -44,7 +47,13 @@ layout = html.Div([
                              "Choose to display data from only GVP, only GEOROC, or both. "
                              "Use the rectangular selection or lasso tool (on the top right corner of the map) "
                              "to select a subset of rock samples, whose chemical composition will be shown "
-                             "in the TAS diagram below. Double-click the map to reset the selection.  ",
+                             "in the TAS diagram below. Double-click the map to reset the selection.  "
+                             "GVP volcanoes with known eruptions can be colored by rock composition "
+                             "(red for felsic, green for intermediate, blue for mafic rocks).  "
+                             "Enter a radius (km) to highlight the GEOROC samples within this distance "
+                             "of the chosen volcano, or of the last point clicked on the map.  "
+                             "Large selections only show part of their samples (outliers, and every rock "
+                             "and material in proportion), tick All samples to show them all.  ",
                     className="description",
                 ),
             ], align='center', className='intro'),
@@ -80,9 +89,29 @@ layout = html.Div([
                         value=['GVP', 'GEOROC'],
                         className='check',
                     ),
+                    # colors of GVP volcanoes
+                    html.Div(children="GVP colors", className="menu-title"),
+                    dcc.RadioItems(
+                        id="gvpcolor-filter",
+                        options=[
+                                 {'label': 'database', 'value': 'database'},
+                                 {'label': 'rock composition', 'value': 'rocks'}],
+                        labelStyle={'margin-right': '5px'},
+                        value='database',
+                    ),
                 ], width=3),
-                # empty column to create alignment
+                # third column
                 dbc.Col([
+                    # radius around a volcano or a clicked point
+                    html.Div(children="Radius (km)", className="menu-title"),
+                    dcc.Input(
+                        id="radius-filter",
+                        type="number",
+                        min=0,
+                        # default value, no radius
+                        value=0,
+                        debounce=True,
+                    ),
                 ], width=3),
             ], align='center', ),
             html.Br(),
@@ -119,6 +148,15 @@ layout = html.Div([
                         html.Button('Download', id='button-1', n_clicks=0),
                     ),
                 ], width=1),
+                dbc.Col([
+                    # by default, large TAS diagrams only show part of the samples
+                    dcc.Checklist(
+                        id="fullres-filter",
+                        options=[{'label': 'All samples', 'value': 'all'}],
+                        value=[],
+                        className='check',
+                    ),
+                ], width=2),
             ], align='center'),
             html.Br(),
             dbc.Row([
@@ -148,25 +186,48 @@ layout = html.Div([
     [
         dash.dependencies.Output("map", "figure"),
         dash.dependencies.Output("map", "selectedData"),
+        dash.dependencies.Output("map", "clickData"),
     ],
     [
         # from drop down
         dash.dependencies.Input("region-filter", "value"),
         # from check list
         dash.dependencies.Input("db-filter", "value"),
+        # from radius input
+        dash.dependencies.Input("radius-filter", "value"),
+        # from a click on the map
+        dash.dependencies.Input("map", "clickData"),
+        # from radio button
+        dash.dependencies.Input("gvpcolor-filter", "value"),
+    ],
+    [
+        # the map currently shown
+        dash.dependencies.State("map", "figure"),
     ],
 )
-def update_map(volcano_name, db):
+def update_map(volcano_name, db, radius, clickpt, gvpcolor, thisfig):
     """
 
     Args:
         volcano_name: GEOROC volcano name from drop down menu
         db: choice of deb from the checkboxes
+        radius: radius (km) around the volcano or the clicked point
+        clickpt: output from a click on the map
+        gvpcolor: whether GVP volcanoes are colored by database or by rock composition
+        thisfig: the map currently shown
 
     Returns:
-        returns a world map
+        returns a world map, the selected points and the clicked point (cleared when a volcano is chosen)
 
     """
+    changed_id = [p['prop_id'] for p in dash.callback_context.triggered][0]
+    # only the colors of the GVP volcanoes change, the selected points are kept
+    if changed_id == 'gvpcolor-filter.value' and not (thisfig is None):
+        return [color_gvp(thisfig, gvpcolor), dash.no_update, dash.no_update]
+    # clicks only matter for the radius, the map and the selected points are kept otherwise
+    # (the click is also cleared below when a volcano is chosen)
+    if changed_id == 'map.clickData' and (not radius or clickpt is None):
+        return [dash.no_update, dash.no_update, dash.no_update]
 
     # default center and zoom
     this_center = {}
@@ -196,10 +257,23 @@ def update_map(volcano_name, db):
             this_zoom = 8
 
     dffig = create_map_samples(db, volcano_name)
+
+    # samples within the radius, around the last clicked point if the map was just clicked
+    # or the radius changed since, otherwise around the chosen volcano
+    if not (radius is None) and radius > 0:
+        if changed_id in ['map.clickData', 'radius-filter.value'] and not (clickpt is None):
+            this_center = {'lat': clickpt['points'][0]['lat'], 'lon': clickpt['points'][0]['lon']}
+            dffig = add_radius_samples(dffig, this_center['lat'], this_center['lon'], radius)
+        elif len(this_center) > 0:
+            dffig = add_radius_samples(dffig, this_center['lat'], this_center['lon'], radius)
+
     fig = displays_map_samples(dffig, this_zoom, this_center)
+    fig = color_gvp(fig, gvpcolor)
 
-    # this resets the selected points
-    return [fig, None]
+    # this resets the selected points, and the clicked point if a volcano was chosen
+    if changed_id == 'region-filter.value':
+        return [fig, None, None]
+    return [fig, None, dash.no_update]
 
 
 def create_map_samples(db, thisvolcano):
@@ -296,6 +370,26 @@ def create_map_samples(db, thisvolcano):
     return dfchoice
 
 
+def add_radius_samples(thisdf, lat, lon, radius):
+    """
+
+    Args:
+        thisdf: dataframe to be plotted on the world map
+        lat: latitude of the volcano or clicked point
+        lon: longitude of the volcano or clicked point
+        radius: radius in km
+
+    Returns:
+        the same dataframe, with the GEOROC samples within the radius added, the distance is in the name
+
+    """
+    dfnear = samples_within_radius(lat, lon, radius)
+    dfnear['db'] = 'Rock sample within ' + str(radius) + ' km (GEOROC)'
+    dfnear['Name'] = dfnear['SAMPLE NAME'].astype(str) + ' (' + dfnear['Distance (km)'].round(1).astype(str) + ' km)'
+
+    return thisdf.append(dfnear[['Latitude', 'Longitude', 'db', 'Name']])
+
+
 def displays_map_samples(thisdf, thiszoom, thiscenter):
     """
 
@@ -313,6 +407,10 @@ def displays_map_samples(thisdf, thiszoom, thiscenter):
                                'Volcano with known eruptions (GVP)': 'maroon',
                                'Volcano with no known eruption (GVP)': 'black',
                                'Matching rock sample (GEOROC)': 'cornflowerblue'}
+    # samples within a radius, the label contains the radius
+    for lbl in thisdf['db'].unique():
+        if lbl.startswith('Rock sample within'):
+            this_color_discrete_map[lbl] = 'darkorange'
 
     fig = px.scatter_mapbox(thisdf, lat="Latitude", lon="Longitude",
                             color='db', color_discrete_map=this_color_discrete_map,
@@ -324,6 +422,36 @@ def displays_map_samples(thisdf, thiszoom, thiscenter):
     return fig
 
 
+def color_gvp(thisfig, gvpcolor):
+    """
+
+        Args:
+            thisfig: map of the world (figure or dictionary, as stored in the dcc.Graph)
+            gvpcolor: 'rocks' to color GVP volcanoes with eruptions by rock composition,
+                      otherwise, they get the color of their database
+
+        Returns:
+            the same map, where only the marker colors of GVP volcanoes with eruptions are updated,
+            using the colors computed once for all volcanoes (see volcano_rock_colors)
+
+    """
+    if gvpcolor == 'rocks':
+        thiscolor = volcano_rock_colors
+    else:
+        thiscolor = 'maroon'
+
+    # the volcanoes are in the same order as in dfv
+    if isinstance(thisfig, dict):
+        for trace in thisfig['data']:
+            if trace.get('name') == 'Volcano with known eruptions (GVP)':
+                trace['marker']['color'] = thiscolor
+    else:
+        thisfig.update_traces(marker=dict(color=thiscolor),
+                              selector=dict(name='Volcano with known eruptions (GVP)'))
+
+    return thisfig
+
+
 # ******************************************#
 #
 # 2nd callback for updates based on dropdown
@@ -341,15 +469,18 @@ def displays_map_samples(thisdf, thiszoom, thiscenter):
         dash.dependencies.Input("map", "selectedData"),
         # from button
         dash.dependencies.Input('button-1', 'n_clicks'),
+        # from check list
+        dash.dependencies.Input('fullres-filter', 'value'),
     ],
 )
-def update_tas_download(volcano_name, selectedpts, button):
+def update_tas_download(volcano_name, selectedpts, button, fullres):
     """
 
     Args:
         volcano_name: GEOROC name
         selectedpts: output from select tool, either box or lasso
         button: download button
+        fullres: whether all samples are drawn, instead of at most taspointbudget
     Returns: updates the TAS diagram and reset the selected points
 
     """
@@ -359,7 +490,11 @@ def update_tas_download(volcano_name, selectedpts, button):
     fig.update_layout(title='<b>Chemical Rock Composition from Georoc</b> <br>', )
     # adds TAS layout
     fig = plot_tas(fig)
-    fig, tas_data = update_tas(fig, volcano_name, selectedpts)
+    if len(fullres) > 0:
+        budget = None
+    else:
+        budget = taspointbudget
+    fig, tas_data = update_tas(fig, volcano_name, selectedpts, budget)
 
     # downloads
     download_tasdata(tas_data, button, volcano_name)
@@ -367,15 +502,16 @@ def update_tas_download(volcano_name, selectedpts, button):
     return fig
 
 
-def update_tas(fig, volcano_name, selectedpts):
+def update_tas(fig, volcano_name, selectedpts, budget=taspointbudget):
     """
 
        Args:
            fig: figure to be updated
            volcano_name: chosen volcano_name
            selectedpts: points selected by lasso/box tool
+           budget: maximum number of samples drawn (see decimate_samples), all if None
        Returns:
-           a TAS diagram for these selected points
+           a TAS diagram for these selected points (all of them are downloaded)
        """
 
     # for lasso tool:
@@ -456,7 +592,7 @@ def update_tas(fig, volcano_name, selectedpts):
         thisgeogr = detects_chems(dfloaded, ['SIO2(WT%)', 'NA2O(WT%)', 'K2O(WT%)'], morechems, lbls)
 
         # draws the scatter plot
-        fig = plot_chem(fig, thisgeogr, ['SIO2(WT%)', 'NA2O(WT%)', 'K2O(WT%)'], lbls)
+        fig = plot_chem(fig, thisgeogr, ['SIO2(WT%)', 'NA2O(WT%)', 'K2O(WT%)'], lbls, budget)
     else:
         thisgeogr = pd.DataFrame()
 
@@ -4,7 +4,8 @@
 # volcano, with below its chronogram.
 # Contains two functions:
 # 1) update_joint_chemchart: jointly updates both TAS diagrams
-# 2) add_chems: superimpose chemicals on chronogram
+# 2) add_chems: superimpose chemicals on chronogram, with their median per year or decade (see bin_chems)
+# The repose times and durations of eruptions are shown below (see update_repose_chart).
 #
 # Author: F. Oggier
 # Last update: Jan 23 2023 (fixed bug on line 341)
@@ -48,7 +49,10 @@ layout = html.Div([
                     "before BC, after BC until 1679, after 1679. "
                     "VEI data is superimposed, the line connecting the VEI points shows "
                     "the fluctuations of VEI over time." 
-                    "Samples from Georoc are further superimposed, to see the evolution of SIO2 and K2O over time.",
+                    "Samples from Georoc are further superimposed, to see the evolution of SIO2 and K2O over time, "
+                    "with their median and interquartile range per year (per decade before 1679). "
+                    "At the bottom, the repose time before every eruption (time since the end of the eruptions before) "
+                    "and its duration are shown, with their median per VEI.",
                     className="description",
                 ),
             ], align='center', className='intro'),
@@ -151,6 +155,17 @@ layout = html.Div([
                                        ),
                     ),
                     ], width=1),
+            ], align='center'),
+
+            # *************************************************#
+            # repose times and durations
+            # **************************************************#
+            dbc.Row([
+                dbc.Col([
+                    html.Div(
+                        dcc.Graph(id="repose-chart"),
+                    ),
+                ], className="card"),
             ], align='center')
         ]),
     ),
@@ -217,6 +232,7 @@ def set_date_options2(volcano_name2):
         dash.dependencies.Output("chem-chart-georoc3", "figure"),
         dash.dependencies.Output("vei-chart3", "figure"),
         dash.dependencies.Output("chem-chart-georoc4", "figure"),
+        dash.dependencies.Output("repose-chart", "figure"),
     ],
     [
         # from drop down
@@ -240,7 +256,7 @@ def update_charts_rock_vei(volcano_name, date, period_choice, addgeoroc):
         addgeoroc: whether to superimpose GEOROC samples or not
 
     Returns:
-        Updates plots based on user's inputs, for first volcano
+        Updates plots based on user's inputs, for first volcano, and the repose times of its eruptions
 
     """
 
@@ -268,13 +284,17 @@ def update_charts_rock_vei(volcano_name, date, period_choice, addgeoroc):
         
         figgvp = go.Figure()
         figgvp, tmp = update_joint_chemchart(volcano_name, dfchem, figgvp, date)
+
+        # repose times and durations of the GVP eruptions
+        fig3 = update_repose_chart(n)
         
     else:
         fig2 = go.Figure()
         figgvp = go.Figure()
         figgvp = plot_tas(figgvp)
+        fig3 = go.Figure()
 
-    return fig, fig2, figgvp
+    return fig, fig2, figgvp, fig3
 
 
 def update_joint_chemchart(thisvolcano_name, thisdf, thisfig, thisdate):
@@ -296,88 +316,35 @@ def update_joint_chemchart(thisvolcano_name, thisdf, thisfig, thisdate):
     colsgvp = ['Volcano Name', 'Start Year', 'End Year', 'VEI']
     
     # makes sure there is a volcano name
-    if not (thisvolcano_name == "start") and not(thisvolcano_name is None):
-        # laods a combined GVP GEOROC dataframe
-        dfgvpgeo = pd.DataFrame([], columns=colsgvp + list(thisdf))
-        
-        # we need a GVP match
-        if (thisvolcano_name in dict_Georoc_GVP.keys()) or (thisvolcano_name in dict_Georoc_sl.keys()):
-            n = thisvolcano_name
-            # handles long names
-            if n in dict_Georoc_sl.keys():
-                n = dict_Georoc_sl[n]
-            # automatic matching
-            if n in dict_Georoc_GVP.keys():
-                n = dict_Georoc_GVP[n]
-            else:
-                n = thisvolcano_name.title()
-                
-            # loads volcano data    
-            dfmatchv = df[df['Volcano Name'] == n]
-            
-            # makes sure there is data
-            if len(dfmatchv.index) > 0:
-                # if NaN for 'End Year', uses 'Start Year'
-                dfmatchv['End Year'] = dfmatchv.apply(
-                    lambda row: row['Start Year'] if pd.isnull(row['End Year']) else row['End Year'], axis=1)    
-            
-            # matches dates    
-            if thisdate == 'all':
-                all_dates_gvp = match_gvpdates(thisvolcano_name, 'forall', n)
-            else:
-                this_date_gvp = match_gvpdates(thisvolcano_name, thisdate, n)
-                # check if matches for this date (fixed on Jan 23 2023)
-                if not(this_date_gvp[0]) == 'not found':
-                    all_dates_gvp = [[int(thisdate.split('-')[0]), this_date_gvp]]
-                else:
-                    all_dates_gvp = []
-            
-        else:
-            all_dates_gvp = []
-             
-        # if match found
+    # we need a GVP match
+    if not (thisvolcano_name == "start") and not(thisvolcano_name is None) and \
+            ((thisvolcano_name in dict_Georoc_GVP.keys()) or (thisvolcano_name in dict_Georoc_sl.keys())):
         # thisdf already contains the right data, issue is to match with GVP to get VEI data
-        if len(all_dates_gvp) > 0:
-            for dse in all_dates_gvp:
-                gy = dse[0]
-                se = dse[1]
-                # there could be several rows in dfmatch, if several eruptions in one year
-                dfmatch = dfmatchv[(dfmatchv['Start Year'].astype(str) == se[0]) &
-                                   (dfmatchv['End Year'].astype(str) == se[1])]
-                # georoc month
-                gm = [x for x in thisdf[thisdf['ERUPTION YEAR'] == gy]['ERUPTION MONTH'].unique()]
-                gm_clean = [x for x in gm if not(np.isnan(x)) and (x > 0)]
-            
-                # in the same year, looks for month match
-                if (se[0] == se[1]) and len(gm_clean) > 0:
-                    # extract month
-                    gvpm = [list(x) for x in dfmatch[['Start Month', 'End Month']].astype(float).values] 
-                    # removes 0 and nan
-                    gvpm = [x for x in gvpm if (not(np.isnan(x[0])) and (x[0] > 0)
-                                                and not(np.isnan(x[1])) and (x[1] > 0))]
-                    # matches month
-                    fnd_months = [[y, x] for x in gvpm for y in gm if x[0] <= y <= x[1]]
-                    if len(fnd_months) > 0:
-                        # GEOROC month
-                        gm = [x[0] for x in fnd_months]
-                        # gvp start and end months
-                        sm = [x[1][0] for x in fnd_months]
-                        em = [x[1][1] for x in fnd_months]
-                        dfmatch = dfmatch[(dfmatch['Start Month'].astype(float).isin(sm)) &
-                                          (dfmatch['End Month'].astype(float).isin(em))]
-                 
-                # if months are matching, unlikely to have several rows left
-                # if several rows, takes the first 
-                rowgvp = dfmatch[colsgvp].values[0]
-                # there could be several GEOROC rows for one GVP row
-                rowsgeoroc = thisdf[(thisdf['ERUPTION YEAR'] == gy) &
-                                    (thisdf['ERUPTION MONTH'].isin(gm))][list(thisdf)].values
-                rowdf = []
-                for rw in rowsgeoroc:
-                    rowdf.append(list(rowgvp)+list(rw))
-                dfgvpgeo = dfgvpgeo.append(pd.DataFrame(rowdf, columns=colsgvp + list(thisdf)))
-                        
-        dff = dfgvpgeo
+        # every sample gets the eruption matching its date, from the precomputed links
+        dff = link_eruptions(thisvolcano_name, thisdf)
+
+        n = thisvolcano_name
+        # handles long names
+        if n in dict_Georoc_sl.keys():
+            n = dict_Georoc_sl[n]
+        # automatic matching
+        if n in dict_Georoc_GVP.keys():
+            n = dict_Georoc_GVP[n]
+        else:
+            n = thisvolcano_name.title()
+
+        # GVP data of the eruptions of this volcano
+        # an eruption number may appear more than once in GVP, the first row is kept
+        dfmatchv = volcano_eruptions(n, typed=False)[['Eruption Number'] + colsgvp].copy()
+        dfmatchv = dfmatchv.drop_duplicates(subset='Eruption Number')
+        dfmatchv['Eruption Number'] = dfmatchv['Eruption Number'].astype(int)
+        # if NaN for 'End Year', uses 'Start Year'
+        dfmatchv['End Year'] = dfmatchv['End Year'].fillna(dfmatchv['Start Year'])
+        dff = dfmatchv.merge(dff, on='Eruption Number', how='inner')[colsgvp + list(thisdf)]
+
+    elif not (thisvolcano_name == "start") and not(thisvolcano_name is None):
+        # laods a combined GVP GEOROC dataframe
+        dff = pd.DataFrame([], columns=colsgvp + list(thisdf))
                   
     else:
         # empty dataframe with right columns
@@ -402,16 +369,19 @@ def add_chems(thisdf, thisfig, thisperiod):
     """
 
     Args:
-        thisdf: GEOROC data
+        thisdf: GEOROC data, sorted by date (as returned by update_chemchart)
         thisfig: chronogram figure to be updated
         thisperiod: 3 periods of eruptions
         
     Returns:
-        add GEOROC chemical to GVP chronogram
+        add GEOROC chemical to GVP chronogram: the samples, and the median and interquartile range of SIO2 and
+        NA2O+K2O per year (1679 and after) or per decade (before)
 
     """
+    # samples are sorted by date, so periods are slices
+    years = thisdf['ERUPTION YEAR'].values
     if thisperiod == '1679 and after':
-        thisdf = thisdf[thisdf['ERUPTION YEAR'] >= 1679].rename(columns={'ERUPTION YEAR': 'year',
+        thisdf = thisdf.iloc[np.searchsorted(years, 1679):].rename(columns={'ERUPTION YEAR': 'year',
                                                                          'ERUPTION MONTH': 'month',
                                                                          'ERUPTION DAY': 'day'})
         # removes some bad inputs
@@ -420,53 +390,64 @@ def add_chems(thisdf, thisfig, thisperiod):
         # in case the day is more than 31   
         thisdf['day'] = np.where((thisdf['day'] > 31), 1, thisdf['day'])      
         thisdf['day'] = thisdf['day'].replace(0, 1)
-        
-    elif thisperiod == 'before 1679':
-        thisdf = thisdf[(thisdf['ERUPTION YEAR'] < 1679) & (thisdf['ERUPTION YEAR'] > 0)]
+        xdate = pd.to_datetime(thisdf[['year', 'month', 'day']])
+        binyears = thisdf['year']
+        width = 1
+
     else:
-        thisdf = thisdf[thisdf['ERUPTION YEAR'] < 0]
-    
-    # just makes sure we got float and not string    
-    thisdf['K2O(WT%)'] = thisdf['K2O(WT%)'].astype(float).apply(lambda x: round(x, 2))    
-    thisdf['NA2O(WT%)'] = thisdf['NA2O(WT%)'].astype(float).apply(lambda x: round(x, 2)) 
-    thisdf['SIO2(WT%)'] = thisdf['SIO2(WT%)'].astype(float).apply(lambda x: round(x, 2))   
-            
-    for lbl in lbls:
-       
-        # selects rows based on rocks of interest
-        dffc = thisdf[thisdf['color'] == lbl]
-        
-        if thisperiod == '1679 and after':
-            xdate = pd.to_datetime(dffc[['year', 'month', 'day']])
-           
+        if thisperiod == 'before 1679':
+            thisdf = thisdf.iloc[np.searchsorted(years, 0, side='right'):np.searchsorted(years, 1679)]
         else:
-            xdate = dffc['ERUPTION YEAR']
-        
-        # add K2O
+            thisdf = thisdf.iloc[:np.searchsorted(years, 0)]
+        xdate = thisdf['ERUPTION YEAR']
+        binyears = xdate
+        width = 10
+    
+    # just makes sure we got float and not string
+    dffc = thisdf[['SIO2(WT%)', 'NA2O(WT%)', 'K2O(WT%)']].astype(float).round(2)
+    dffc['NA2O+K2O'] = dffc['NA2O(WT%)'] + dffc['K2O(WT%)']
+
+    # median and quartiles per bin
+    dfbins = bin_chems(binyears, dffc[['SIO2(WT%)', 'NA2O+K2O']], width)
+    if thisperiod == '1679 and after':
+        # middle of the year
+        xbins = pd.to_datetime(dfbins.index.astype(int).astype(str) + '-07-01')
+    else:
+        xbins = dfbins.index + width/2
+
+    for chem, ychem, chemname in [(['NA2O(WT%)', 'K2O(WT%)'], 'NA2O+K2O', 'NA2O+K2O'),
+                                  ('SIO2(WT%)', 'SIO2(WT%)', 'SIO2')]:
+        # samples
         thisfig.add_trace(
-            go.Scatter(
+            scatter_type(len(dffc.index))(
                 x=xdate,
                 mode='markers',
                 marker=dict(color='cornflowerblue'),
-                customdata=dffc[['NA2O(WT%)', 'K2O(WT%)']],
+                customdata=dffc[chem],
                 hovertemplate='x=%{x}<br>%{customdata}',
-                y=(0 - .4) + (dffc['K2O(WT%)']+dffc['NA2O(WT%)'])/100,
-                name='NA2O+K2O',
+                y=(0 - .4) + dffc[ychem]/100,
+                name=chemname,
                 showlegend=False
                 )
         )
-          
-        # add SIO2
+        # median, with interquartile range
         thisfig.add_trace(
             go.Scatter(
-                x=xdate,
-                mode='markers',
-                marker=dict(color='cornflowerblue'),
-                customdata=dffc['SIO2(WT%)'],
-                hovertemplate='x=%{x}<br>%{customdata}',
-                y=(0 - .4) + dffc['SIO2(WT%)'].astype(float)/100,
-                name='SIO2',
+                x=xbins,
+                mode='lines+markers',
+                line=dict(color='navy', width=1),
+                marker=dict(color='navy', symbol='diamond'),
+                error_y=dict(type='data', symmetric=False, color='navy',
+                             array=(dfbins[ychem + ' 75%'] - dfbins[ychem + ' 50%'])/100,
+                             arrayminus=(dfbins[ychem + ' 50%'] - dfbins[ychem + ' 25%'])/100),
+                customdata=np.stack([dfbins[ychem + ' 50%'], dfbins[ychem + ' 25%'], dfbins[ychem + ' 75%'],
+                                     dfbins['samples']], axis=-1),
+                hovertemplate='x=%{x}<br>median=%{customdata[0]:.2f}<br>'
+                              'IQR=%{customdata[1]:.2f}-%{customdata[2]:.2f}<br>%{customdata[3]} samples',
+                y=(0 - .4) + dfbins[ychem + ' 50%']/100,
+                name=chemname + ' median',
                 showlegend=False
                 )
-        )   
+        )
+
     return thisfig